@@ -1,17 +1,36 @@
+import asyncio
+import functools
 import multiprocessing
 import os
 import shutil
 import socket
-import time
+import threading
 import traceback
 
+import cv2
 import scipy.io
 import yaml
 
 from src.ballandhoop import WhiteBalancing, Hoop, helper, Image
+from src.ballandhoop.asyncRuntime import AsyncRuntime
+from src.ballandhoop.detectors import create_detector
+from src.ballandhoop.frameScheduler import FrameScheduler
+from src.ballandhoop.hoopDrift import HoopDriftTracker
+from src.ballandhoop.latencyStats import LatencyStats
+from src.ballandhoop import poolWorker
+from src.ballandhoop.debugWriter import DebugSampler, DebugWriter
+from src.ballandhoop.placement import place_role
+from src.ballandhoop.qualityController import QualityController, scale_configs
+from src.ballandhoop.reorderBuffer import ReorderBuffer
+from src.ballandhoop.tracker import BallTracker
 from src.ballandhoop.videostream import VideoStream
 from src.network import init_network
 
+RUNTIMES = ('threaded', 'asyncio')
+"""
+The runtimes of the main loop, see :py:meth:`Application.run()`
+"""
+
 
 class Application:
     """
@@ -26,10 +45,31 @@ class Application:
     :ivar cfg: the config loaded and saved to `config.yml` (saved also to `config.mat`)
     :ivar hostname: the local hostname by either `socket.gethostname() or `force_hostname`
     :ivar network: either the server or client instance, using the :py:class:`.NetworkInterface`
-    :ivar timings: a fifo dict, which saved the in time of the frame, old entries are removed after the frame calc
-    :ivar latest_frame_number: remembers which is the newest frame with a result to discard older results
-    :ivar result_lock: manages the thread safe access to the :py:attr:`latest_frame_number`
+    :ivar latency: the :py:class:`~.latencyStats.LatencyStats`, which measures the latency of each stage of a frame
+    :ivar result_lock: manages the thread safe access to the network
     :type result_lock: multiprocessing.Lock()
+    :ivar tracker: the :py:class:`~.tracker.BallTracker` if `tracking` is enabled in the ball config, None otherwise
+    :ivar drift: the :py:class:`~.hoopDrift.HoopDriftTracker` if `drift_tracking` is enabled in the hoop config,
+        None otherwise
+    :ivar config_lock: manages the thread safe access to the :py:attr:`cfg`, which the drift tracker changes from its
+        background thread
+    :type config_lock: multiprocessing.Lock()
+    :ivar scheduler: the :py:class:`~.frameScheduler.FrameScheduler` which hands the frames to the thread-workers
+    :ivar reorder: the :py:class:`~.reorderBuffer.ReorderBuffer` which brings the results back into frame order
+    :ivar sampler: the :py:class:`~.debugWriter.DebugSampler` which picks the frames for debug pictures in verbose
+        mode, None otherwise
+    :ivar debug_writer: the :py:class:`~.debugWriter.DebugWriter` process which saves the debug pictures in verbose
+        mode, None otherwise
+    :ivar quality: the :py:class:`~.qualityController.QualityController` if `adaptive` is enabled, None otherwise
+    :ivar hoop: the hoop in the configured resolution, replaced as a whole if it moved
+    :ivar detector: the detector of the main process for the current hoop and resolution, it does the
+        precomputation for the thread-workers
+    :ivar geometry: the shared hoop geometry and scale of the thread-workers, see
+        :py:func:`~.poolWorker.shared_geometry()`
+    :ivar base_shape: the shape of the frames in the configured resolution, the hoop and ball config are calibrated
+        in it
+    :ivar scale: the factors (x, y) from the configured resolution to the current one
+    :ivar debug_config: the debug config, with the radius bounds of the ball as defaults
     """
 
     def __init__(self, force_hostname: str = None, verbose_output: bool = False):
@@ -44,9 +84,22 @@ class Application:
             self.print('[INFO] Forcing different hostname: ' + force_hostname)
             self.hostname = force_hostname
         self.network = None
-        self.timings = dict()
-        self.latest_frame_number = 0
+        self.latency = None
         self.result_lock = multiprocessing.Lock()
+        self.tracker = None
+        self.drift = None
+        self.config_lock = multiprocessing.Lock()
+        self.scheduler = None
+        self.reorder = None
+        self.sampler = None
+        self.debug_writer = None
+        self.quality = None
+        self.hoop = None
+        self.detector = None
+        self.geometry = None
+        self.base_shape = None
+        self.scale = (1, 1)
+        self.debug_config = None
         # if debug folder exists, delete it (and its contents) and re-create a new one
         if os.path.isdir('storage/debug/'):
             shutil.rmtree('storage/debug/')
@@ -102,10 +155,11 @@ class Application:
         Saves the self.cfg back to config.yml and config.mat files.
         """
         self.print("Try to update config files - if this fails, remove keys with empty values from source config")
-        self.print(self.cfg)
-        with open('config.yml', 'w') as outfile:
-            yaml.dump(self.cfg, outfile, default_flow_style=None)
-        scipy.io.savemat('config.mat', {'pi_configs': self.cfg})
+        with self.config_lock:
+            self.print(self.cfg)
+            with open('config.yml', 'w') as outfile:
+                yaml.dump(self.cfg, outfile, default_flow_style=None)
+            scipy.io.savemat('config.mat', {'pi_configs': self.cfg})
         self.print('Updated config file(s)')
 
     def run_calibration(self, calc_wb_gains: bool,
@@ -160,8 +214,12 @@ class Application:
             self.print('|-> searching for ball / Testing color')
             ball_hsv = self.save_col_and_add_from_config('ball', ball_hsv)
             hoop = Hoop(**self.get_cfg('hoop'))
-            ball = hoop.find_ball(frame=raw.image_hsv, **self.local_config()['ball'],
-                                  dir_path='storage/calibration/')
+            frame = raw.image_hsv
+            if self.get_cfg('ball', 'yuv'):
+                frame = cv2.cvtColor(raw.image_bgr, cv2.COLOR_BGR2YUV_I420)
+            elif self.get_cfg('ball', 'color_table'):
+                frame = raw.image_bgr
+            ball = hoop.find_ball(frame=frame, **self.local_config()['ball'], dir_path='storage/calibration/')
             if ball is not None:
                 self.print("|-> Ball found @ " + str(ball.center) + " with r=" + str(ball.radius) +
                            " + deg=" + str(int(ball.angle())) + "°")
@@ -184,64 +242,279 @@ class Application:
         them jobs. Each core gets one thread-worker. They will calculate the results of the frames after each other.
         The thread-workers are especially needed if the application is running under high per frame cpu,
         which can happen with high fps or high resolution settings.
+        The `runtime` of the workers config chooses between this threaded main loop and the
+        :py:class:`~.asyncRuntime.AsyncRuntime`.
 
         :param ball_hsv: if this parameter is set, the ball hsv in config is overwritten
         :type ball_hsv: dict
         """
         # saves the new colors to the config
         self.save_col_and_add_from_config('ball', ball_hsv)
+        runtime = self.get_cfg('workers', 'runtime') or 'threaded'
+        if runtime not in RUNTIMES:
+            raise Exception('Unknown runtime "' + str(runtime) + '", known are: ' + ', '.join(RUNTIMES))
         # give config to object constructors to initialize like defined in config
         # ** does flatten the array to arguments, with their corresponding keys as argument names
-        hoop = Hoop(**self.get_cfg('hoop'))
-        video = VideoStream(**self.get_cfg('camera'))
+        self.hoop = Hoop(**self.get_cfg('hoop'))
+        # the detector engine is chosen by the ball config, the thread-workers search with their own copy of it,
+        # this one only holds the hoop and the ball config in the current resolution
+        self.detector = create_detector(self.hoop, self.get_cfg('ball'))
+        # with the color table the ball mask is looked up in bgr directly, so do not convert the frames to hsv
+        # and with yuv the raw planes of the camera are used without any conversion at all
+        video = VideoStream(**dict(self.get_cfg('camera'), as_hsv=not self.get_cfg('ball', 'color_table'),
+                                   as_yuv=bool(self.get_cfg('ball', 'yuv'))))
+        # the resolution and framerate follow the measured latency, if enabled
+        if self.get_cfg('adaptive', 'enabled'):
+            self.quality = QualityController(video.resolution_no, video.framerate, **self.get_cfg('adaptive'))
+        # the tracker predicts a small search window out of the latest results, if enabled
+        if self.get_cfg('ball', 'tracking'):
+            self.tracker = BallTracker(self.hoop, **self.get_cfg('ball'))
+        # the drift tracker searches the hoop markers again in a background thread now and then
+        if self.get_cfg('hoop', 'drift_tracking'):
+            color_space = 'hsv'
+            if self.get_cfg('ball', 'yuv'):
+                color_space = 'yuv'
+            elif self.get_cfg('ball', 'color_table'):
+                color_space = 'bgr'
+            self.drift = HoopDriftTracker(self.hoop, color_space, on_update=self.save_hoop_to_config,
+                                          **self.get_cfg('hoop'))
+            self.drift.start()
         # the network needs object context for better access in the async callback method from the workers
         self.network = init_network(**self.get_cfg('network'))
+        # the timestamps of each stage of a frame, summarized now and then
+        self.latency = LatencyStats(**dict(self.get_cfg('latency') or {}, verbose=self.verbose))
+        self.network.record_latency = self.latency.record
+        if runtime == 'asyncio':
+            # capture, dispatch, network and serial are tasks of one event loop
+            try:
+                asyncio.run(AsyncRuntime(self, video, **(self.get_cfg('workers') or {})).run())
+            except KeyboardInterrupt:
+                pass
+            return
         # start network
         with self.network:
+            pool = None
             try:
-                # start thread-worker pool,
-                pool = multiprocessing.Pool(processes=os.cpu_count())
+                pool = self.start_workers(video, self.send_result_callback, self.result_late_callback)
+                # start the capture, so its thread can be placed as well
+                frames = iter(video)
+                self.place_threads(self.get_cfg('placement') or {}, video, pool)
+                # only a few frames are in the pool at once, if the workers fall behind the older frames are dropped
+                self.scheduler = FrameScheduler(pool, os.cpu_count(), callback=self.ball_found_async_callback,
+                                                error_callback=self.ball_search_error_callback,
+                                                on_drop=self.frame_dropped_callback,
+                                                on_dispatch=functools.partial(self.latency.mark, mark='dispatched'),
+                                                **(self.get_cfg('workers') or {}))
                 # count the number of frames, this will be important to reconstruct original frame order
                 i = 0
                 # iterate over the video frames (most likely infinitely)
-                for frame in video:
+                for frame in frames:
                     # increase frame counter
                     i = i + 1
-                    # log the time of frame delivery
-                    self.timings[i] = time.time()
-
-                    debug_dir_path = None
-                    # if in debugging mode save every 30th frame in this folder for that frame
-                    if self.verbose and i % 30 == 0:
-                        debug_dir_path = './storage/debug/' + str(i) + "/"
-                        os.makedirs(debug_dir_path, exist_ok=True)
+                    # log the time of frame capture
+                    self.latency.start(i, video.timestamp)
+                    # send the waiting results, if the older ones took too long
+                    self.reorder.flush()
+                    # print the latency summary, if its interval is over
+                    self.latency.summarize()
+                    func, args, release = self.next_task(i, frame, video,
+                                                         self.scheduler.dropped + video.overwritten)
                     # normal loop:
-                    # send the task to the next available thread-worker, from the pool
-                    # the threads will call hoop.find_ball(frame=frame, cols=ball_hsv, iterations=0)
-                    # search for the ball in the frame with the given color borders
-                    pool.apply_async(hoop.find_ball_async,
-                                     args=(i, frame, self.local_config()['ball'], debug_dir_path),
-                                     callback=self.ball_found_async_callback,
-                                     error_callback=self.ball_search_error_callback)
+                    # send the task to the next available thread-worker, from the pool (or let it wait for one)
+                    self.latency.mark(i, 'submitted')
+                    self.scheduler.submit(i, func, args, release)
             except KeyboardInterrupt:
                 # break potential infinite loop
                 pass
 
             finally:
                 print('Closing resources, worker and so on')
-                video.close()
-                pool.terminate()
-                pool.close()
-                # pool.join()
+                if self.scheduler is not None:
+                    print('Sent ' + str(self.scheduler.dispatched) + ' frames to the workers, dropped ' +
+                          str(self.scheduler.dropped) + ' frames')
+                self.close(video, pool)
+
+    def start_workers(self, video: VideoStream, on_result, on_late):
+        """
+        Starts the thread-workers and everything the results pass through until they are sent: the reorder buffer
+        and, in verbose mode, the debug sampler and writer. The threads are placed by :py:meth:`place_threads()`
+        afterwards.
+
+        :param video: the video stream
+        :param on_result: called with the frame number and the result in frame order, see
+            :py:class:`~.reorderBuffer.ReorderBuffer`
+        :param on_late: called with the frame number and the result of a frame which was skipped already
+        :return: the thread-worker pool
+        """
+        # the results are sent in frame order, a result waits a short time for the older ones
+        self.reorder = ReorderBuffer(on_result=on_result, on_late=on_late, **(self.get_cfg('workers') or {}))
+        # start thread-worker pool, each thread-worker gets the configs only once and keeps its own
+        # detector, only a moved hoop or another resolution is shared with them afterwards
+        self.debug_config = dict({'min_radius': self.get_cfg('ball', 'min_radius') or 0,
+                                  'max_radius': self.get_cfg('ball', 'max_radius')},
+                                 **(self.get_cfg('debug') or {}))
+        if self.verbose:
+            # the debug pictures of the sampled frames are saved in a process of their own
+            self.sampler = DebugSampler(**self.debug_config)
+            self.debug_writer = DebugWriter(self.debug_config.get('queue_size', 8))
+        # the workers are processes, threads or the main loop itself, depending on the execution mode
+        self.geometry = poolWorker.shared_geometry(self.hoop)
+        mode = self.get_cfg('workers', 'mode') or 'process'
+        # the workers place themselves, but inline the main loop is the worker and is placed as capture
+        placement = self.get_cfg('placement') or {}
+        pool = poolWorker.create_pool(mode, os.cpu_count(), initializer=poolWorker.init_worker,
+                                      initargs=(self.get_cfg('hoop'), self.get_cfg('ball'), self.geometry,
+                                                None if mode == 'inline' else placement, self.debug_writer))
+        return pool
+
+    def next_task(self, i: int, frame, video: VideoStream, dropped: int) -> tuple:
+        """
+        Prepares the search of a frame: follows a moved hoop and another resolution, samples the debug frames
+        and predicts the search window. Called for each frame in the main loop.
+
+        :param i: the number of the frame
+        :param frame: the frame array
+        :param video: the video stream the frame came from
+        :param dropped: the amount of frames which were dropped or overwritten since the start
+        :return: the function a thread-worker calls, its arguments and the release of the frame (or None)
+        :rtype: tuple
+        """
+        debug_dir_path = None
+        # if in debugging mode save the sampled frames in this folder for that frame
+        if self.sampler is not None and self.sampler.sample(i) is not None:
+            debug_dir_path = './storage/debug/' + str(i) + "/"
+        if self.quality is not None:
+            level = self.quality.update(i, dropped)
+            if level is not None:
+                print('[QUALITY] changing to resolution ' + str(VideoStream.resolutions[level[0]]) +
+                      ' at ' + str(level[1]) + ' fps')
+                video.reconfigure(*level)
+        if self.base_shape is None:
+            self.base_shape = frame.shape
+        # the frames get another shape some frames after the resolution was changed
+        frame_scale = (frame.shape[1] / self.base_shape[1], frame.shape[0] / self.base_shape[0])
+        moved = False
+        if self.drift is not None:
+            # only hands over the reference, the search is done in the background
+            # the markers are calibrated in the configured resolution, so they are only searched in it
+            if frame_scale == (1, 1):
+                self.drift.offer(i, frame, copy=video.ring is not None)
+            moved = self.drift.hoop is not self.hoop
+        if moved or frame_scale != self.scale:
+            # the hoop is swapped as a whole, the workers build their detector again with it
+            if moved:
+                self.hoop = self.drift.hoop
+            hoop_config, ball_config = scale_configs(
+                dict(self.get_cfg('hoop'), center=self.hoop.center, radius=self.hoop.radius,
+                     center_dots=self.hoop.center_dots), self.get_cfg('ball'), frame_scale)
+            self.detector = create_detector(Hoop(**hoop_config), ball_config)
+            poolWorker.set_geometry(self.geometry, self.hoop, frame_scale)
+            if self.tracker is not None and frame_scale != self.scale:
+                self.tracker.rescale(self.detector.hoop, ball_config['max_radius'], i)
+            elif self.tracker is not None:
+                self.tracker.hoop = self.detector.hoop
+            if self.sampler is not None:
+                _, radii = scale_configs(hoop_config, self.debug_config, frame_scale)
+                self.sampler.min_radius, self.sampler.max_radius = radii['min_radius'], radii['max_radius']
+            self.scale = frame_scale
+        search_window = None
+        if self.tracker is not None:
+            search_window = self.tracker.predict_window(i)
+        # the threads will call the detect() of their own detector, which searches the ball in the frame
+        # with the engine and config given in the ball config
+        if video.ring is not None:
+            # only the slot index is sent, the worker reads the frame from the shared memory
+            # the slot is given back as soon as the worker is done with it, or the frame is dropped
+            return (poolWorker.detect_slot, (video.ring, video.slot, i, debug_dir_path, search_window),
+                    functools.partial(video.ring.release, video.slot))
+        return poolWorker.detect, (i, frame, debug_dir_path, search_window), None
+
+    def close(self, video: VideoStream, pool=None):
+        """
+        Prints the statistics of the run and closes the resources, the network is closed by its caller
+
+        :param video: the video stream
+        :param pool: the thread-worker pool, if it was started
+        """
+        self.latency.close()
+        if self.reorder is not None:
+            print('Sent ' + str(self.reorder.emitted) + ' results in order, skipped ' +
+                  str(self.reorder.skipped) + ' frames, ' + str(self.reorder.late) + ' results came too late')
+        video.close()
+        if self.debug_writer is not None:
+            self.debug_writer.close()
+            print('Sampled debug frames ' + str(self.sampler.sampled) + ', wrote ' +
+                  str(self.debug_writer.written.value) + ', dropped ' +
+                  str(self.debug_writer.dropped.value))
+        if video.capture_thread:
+            print('The capture thread overwrote ' + str(video.overwritten) + ' frames')
+        if self.quality is not None:
+            print('Changed the quality ' + str(self.quality.changes) + ' times, ended with resolution ' +
+                  str(VideoStream.resolutions[video.resolution_no]) + ' at ' + str(video.framerate) + ' fps')
+        if self.drift is not None:
+            self.drift.close()
+        if pool is not None:
+            pool.terminate()
+            pool.close()
+            # pool.join()
+
+    def place_threads(self, placement: dict, video: VideoStream, pool):
+        """
+        Pins the threads of the main process to their cpus and sets their scheduling policy, like the `placement`
+        config says for their role, and prints the effective placement. The thread-workers place themselves,
+        see :py:func:`~.poolWorker.init_worker()`.
+
+        :param placement: the placement config
+        :param video: the started video stream
+        :param pool: the thread-worker pool
+        """
+        place_role('capture', placement, name='main loop')
+        if video.thread is not None:
+            place_role('capture', placement, video.thread.native_id, name='capture thread')
+        if isinstance(self.network, threading.Thread) and self.network.is_alive():
+            place_role('network', placement, self.network.native_id, name='network server')
+        # the result thread of the pool calls the callbacks, which send the results to the network and serial port
+        result_handler = getattr(pool, '_result_handler', None)
+        if result_handler is not None:
+            place_role('network', placement, result_handler.native_id, name='result thread')
+
+    def save_hoop_to_config(self, hoop: Hoop):
+        """
+        Saves the geometry of a moved hoop to the config files, called by the :py:class:`~.hoopDrift.HoopDriftTracker`
+        from its background thread. The config is only changed while holding the :py:attr:`config_lock`, so it is
+        never written to the disk half updated.
+
+        :param hoop: the updated hoop
+        """
+        with self.config_lock:
+            self.local_config()['hoop']['center'] = hoop.center
+            self.local_config()['hoop']['radius'] = hoop.radius
+            self.local_config()['hoop']['center_dots'] = hoop.center_dots
+        self.save_config_to_disk()
+        self.print('Hoop moved to ' + str(hoop.center) + " with r=" + str(hoop.radius))
+
+    def frame_dropped_callback(self, frame_number: int):
+        """
+        Called by the :py:class:`~.frameScheduler.FrameScheduler` for each frame which was replaced by a newer one,
+        before a thread-worker got it
+
+        :param frame_number: the number of the dropped frame
+        """
+        # nobody has to wait for the result of this frame
+        self.reorder.drop(frame_number)
+        self.print("Frame " + str(frame_number) + " dropped")
 
-    def ball_search_error_callback(self, e):
+    def ball_search_error_callback(self, frame_number: int, e):
         """
         This is the callback method which is provided to the thread-worker. It is called if there is an error in one of
         the thread-workers. Without this method the thread-worker would fail silent.
         It still does, if verbose flag is not set
 
+        :param frame_number: the number of the failed frame
         :param e: The error
         """
+        # the failed frame has no result, so the newer results do not wait for it
+        self.reorder.drop(frame_number)
         self.print('Error')
         if self.verbose:
             traceback.print_exception(type(e), e, e.__traceback__)
@@ -251,27 +524,77 @@ class Application:
         The method which is called after the thread-worker run and did not fail
 
         :param result: the result of the thread worker, can only be one argument, the thread-worker is not able to send a second one
-        :type result: tuple
+        :type result: poolWorker.BallResult
         """
-        # callback merges all return values in one parameter, so unmerge it
-        frame_number, ball = result
+        frame_number = result.frame_number
+        ball = result if result.found() else None
+        self.latency.mark(frame_number, 'started', result.started)
+        self.latency.mark(frame_number, 'finished', result.finished)
+        self.latency.mark(frame_number, 'returned')
+        if self.tracker is not None:
+            # the tracker ignores results which are older than its newest one by itself
+            self.tracker.update(frame_number, ball)
+        # the result is sent, as soon as the older ones are sent or took too long
+        self.reorder.push(frame_number, ball)
+
+    def send_result_callback(self, frame_number: int, ball):
+        """
+        Sends the result of a frame to the network, called by the :py:class:`~.reorderBuffer.ReorderBuffer` in frame
+        order
+
+        :param frame_number: the number of the frame
+        :param ball: the found ball, if any
+        :type ball: poolWorker.BallResult | None
+        """
+        self.latency.mark(frame_number, 'emitted')
+        captured = self.latency.captured(frame_number)
         # announce that you would like to do network stuff, and reserve the resources
         with self.result_lock:
-            # send the ball angle result to the network
-            if frame_number <= self.latest_frame_number:
-                # frame is too old, discard
-                self.network.send(self.network.WRONG_ORDER)
-                return
-            # set new highest evaluated frame
-            self.latest_frame_number = frame_number
             # send angle or error code, that no ball was found
             if ball is not None:
-                self.network.send(ball.angle())
+                self.network.send(ball.angle, frame_number, captured)
             else:
-                self.network.send(self.network.NOT_FOUND)
-            # remove time and calc how long whole frame took
-            start_time = self.timings.pop(frame_number)
-        self.print("Frame " + str(frame_number) + " took " + str(int((time.time() - start_time) * 1000)) + "ms")
+                self.network.send(self.network.NOT_FOUND, frame_number, captured)
+        self.result_sent(frame_number, ball)
+
+    def result_sent(self, frame_number: int, ball):
+        """
+        Finishes a frame after its result was sent
+
+        :param frame_number: the number of the frame
+        :param ball: the found ball, if any
+        """
+        # takes the durations of all stages, the frame is done
+        total = self.latency.finish(frame_number)
+        if self.sampler is not None:
+            self.sampler.report(ball)
+        if total is not None:
+            if self.quality is not None:
+                self.quality.observe(frame_number, total)
+            self.print("Frame " + str(frame_number) + " took " + str(int(total * 1000)) + "ms")
+
+    def result_late_callback(self, frame_number: int, ball):
+        """
+        Called by the :py:class:`~.reorderBuffer.ReorderBuffer` for a result which arrived after newer results were
+        sent already
+
+        :param frame_number: the number of the frame
+        :param ball: the found ball, if any
+        """
+        with self.result_lock:
+            # frame is too old, discard
+            self.network.send(self.network.WRONG_ORDER, frame_number, self.latency.captured(frame_number))
+        self.late_result_sent(frame_number)
+
+    def late_result_sent(self, frame_number: int):
+        """
+        Finishes a frame after the error was sent, that its result came too late
+
+        :param frame_number: the number of the frame
+        """
+        if self.sampler is not None:
+            self.sampler.report(wrong_order=True)
+        self.print("Frame " + str(frame_number) + " came too late")
 
     def print(self, msg: str):
         """
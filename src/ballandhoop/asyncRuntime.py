@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+
+from src.ballandhoop.placement import place_role
+
+
+class AsyncRuntime:
+    """
+    Runs the main loop of the :py:class:`~.application.Application` as cooperating tasks of one event loop, instead
+    of a blocking loop with callbacks from the threads of the pool and the network:
+
+    - capture: reads the frames in a thread of its own (reading the camera blocks) and prepares their search with
+      :py:meth:`~.application.Application.next_task()`
+    - dispatch: a task per frame in flight takes the frames and awaits their search in the thread-worker pool,
+      which is the executor here. The results are brought back into frame order by the reorder buffer.
+    - network: sends the results in frame order, see :py:meth:`~network.NetworkInterface.send_async()`
+    - serial: only on the server, writes the sent values to the serial port, see :py:class:`~network.Server`
+
+    Between the tasks are bounded queues, if a queue is full its oldest entry is dropped. So the latency stays bounded
+    like with the :py:class:`~.frameScheduler.FrameScheduler`. The state of the application is only touched in the
+    event loop, the pool only hands the results over. With the inline execution mode the search runs in the event
+    loop itself.
+
+    :param app: the application, with its hoop, detector, network and latency set up
+    :type app: Application
+    :param video: the video stream
+    :type video: VideoStream
+    :param max_in_flight: the amount of frames per thread-worker which are searched at the same time, at least 1
+    :param frame_queue: the amount of frames waiting for a thread-worker
+    :param result_queue: the amount of results waiting for the network
+    :param kwargs: catch-all parameter, so the workers config can be used as parameter
+
+    :ivar frames: the queue of the frames from the capture to the dispatch
+    :ivar results: the queue of the results in frame order to the network
+    :ivar dispatched: the amount of frames sent to the pool
+    :ivar dropped: the amount of frames which were dropped, because all thread-workers were busy
+    :ivar unsent: the amount of results which were dropped, because the network fell behind
+    """
+
+    def __init__(self, app, video, max_in_flight: int = 2, frame_queue: int = 1, result_queue: int = 16, **kwargs):
+        self.app = app
+        self.video = video
+        self.concurrency = os.cpu_count() * max(int(max_in_flight), 1)
+        self.frame_queue = int(frame_queue)
+        self.result_queue = int(result_queue)
+        self.frames = None
+        self.results = None
+        self.pool = None
+        self.executor = None
+        self.dispatched = 0
+        self.dropped = 0
+        self.unsent = 0
+
+    async def run(self):
+        """
+        Runs the tasks until the video stream ends (or the run is cancelled), the frames which are captured already
+        are still searched and sent then
+        """
+        app = self.app
+        # the queues belong to the running event loop
+        self.frames = asyncio.Queue(maxsize=self.frame_queue)
+        self.results = asyncio.Queue(maxsize=self.result_queue)
+        async with app.network:
+            tasks = []
+            try:
+                self.pool = app.start_workers(self.video, self.emit, self.emit_late)
+                # start the capture, so its thread can be placed as well
+                frames = iter(self.video)
+                placement = app.get_cfg('placement') or {}
+                app.place_threads(placement, self.video, self.pool)
+                self.executor = concurrent.futures.ThreadPoolExecutor(1, 'capture', initializer=place_role,
+                                                                      initargs=('capture', placement, None,
+                                                                                'capture executor'))
+                tasks = [asyncio.create_task(self.dispatch(), name='dispatch-' + str(n))
+                         for n in range(self.concurrency)]
+                tasks.append(asyncio.create_task(self.send(), name='network'))
+                capture = asyncio.create_task(self.capture(frames), name='capture')
+                tasks.append(capture)
+                # only the capture ends by itself, any other task only ends with an error
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                try:
+                    await asyncio.wait_for(self.drain(), timeout=5)
+                except asyncio.TimeoutError:
+                    print('Not all frames were sent in time')
+            finally:
+                print('Closing resources, worker and so on')
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                print('Sent ' + str(self.dispatched) + ' frames to the workers, dropped ' + str(self.dropped) +
+                      ' frames, ' + str(self.unsent) + ' results were not sent')
+                app.close(self.video, self.pool)
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def capture(self, frames):
+        """
+        The capture task: reads the frames and queues them for the dispatch tasks
+
+        :param frames: the iterator of the video stream
+        """
+        app, video = self.app, self.video
+        loop = asyncio.get_running_loop()
+        # count the number of frames, this will be important to reconstruct original frame order
+        i = 0
+        while True:
+            frame = await loop.run_in_executor(self.executor, next, frames, None)
+            if frame is None:
+                return
+            i = i + 1
+            # log the time of frame capture
+            app.latency.start(i, video.timestamp)
+            # send the waiting results, if the older ones took too long
+            app.reorder.flush()
+            # print the latency summary, if its interval is over
+            app.latency.summarize()
+            func, args, release = app.next_task(i, frame, video, self.dropped + video.overwritten)
+            app.latency.mark(i, 'submitted')
+            if self.frames.full():
+                # all thread-workers are busy, the oldest waiting frame is outdated
+                self.drop(self.frames.get_nowait())
+                self.frames.task_done()
+            self.frames.put_nowait((i, func, args, release))
+
+    def drop(self, task: tuple):
+        """
+        Throws a waiting frame away
+
+        :param task: the frame number, function, arguments and release of the frame
+        """
+        frame_number, _, _, release = task
+        self.dropped += 1
+        if release is not None:
+            release()
+        self.app.frame_dropped_callback(frame_number)
+
+    async def dispatch(self):
+        """
+        A dispatch task: searches one frame after the other in the pool
+        """
+        app = self.app
+        while True:
+            frame_number, func, args, release = await self.frames.get()
+            try:
+                self.dispatched += 1
+                app.latency.mark(frame_number, 'dispatched')
+                try:
+                    result = await self.apply(func, args)
+                finally:
+                    if release is not None:
+                        release()
+                app.ball_found_async_callback(result)
+            except Exception as e:
+                app.ball_search_error_callback(frame_number, e)
+            finally:
+                self.frames.task_done()
+
+    def apply(self, func, args: tuple) -> asyncio.Future:
+        """
+        Runs the function in the pool
+
+        :param func: the function a thread-worker calls
+        :param args: the arguments of the function
+        :return: the future of its result, which is set in the event loop
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pool.apply_async(func, args=args,
+                              callback=lambda result: loop.call_soon_threadsafe(_settle, future, result, None),
+                              error_callback=lambda e: loop.call_soon_threadsafe(_settle, future, None, e))
+        return future
+
+    def emit(self, frame_number: int, ball, late: bool = False):
+        """
+        Queues a result for the network task, called by the reorder buffer in frame order
+
+        :param frame_number: the number of the frame
+        :param ball: the found ball, if any
+        :param late: flag if the result came after its frame was skipped
+        """
+        if self.results.full():
+            # the network fell behind, the oldest result is outdated
+            self.results.get_nowait()
+            self.results.task_done()
+            self.unsent += 1
+        self.results.put_nowait((frame_number, ball, late))
+
+    def emit_late(self, frame_number: int, ball):
+        """
+        Queues a result which came after its frame was skipped, called by the reorder buffer
+        """
+        self.emit(frame_number, ball, late=True)
+
+    async def send(self):
+        """
+        The network task: sends the results in frame order
+        """
+        app = self.app
+        network = app.network
+        while True:
+            frame_number, ball, late = await self.results.get()
+            captured = app.latency.captured(frame_number)
+            try:
+                if late:
+                    # frame is too old, discard
+                    await network.send_async(network.WRONG_ORDER, frame_number, captured)
+                    app.late_result_sent(frame_number)
+                else:
+                    app.latency.mark(frame_number, 'emitted')
+                    # send angle or error code, that no ball was found
+                    await network.send_async(network.NOT_FOUND if ball is None else ball.angle, frame_number,
+                                             captured)
+                    app.result_sent(frame_number, ball)
+            finally:
+                self.results.task_done()
+
+    async def drain(self):
+        """
+        Waits until the queued frames are searched and their results are sent
+        """
+        reorder = self.app.reorder
+        await self.frames.join()
+        while reorder.waiting:
+            await asyncio.sleep(reorder.deadline)
+            reorder.flush()
+        await self.results.join()
+
+
+def _settle(future: asyncio.Future, result=None, error: BaseException = None):
+    """
+    Sets the result or the error of the future, if it is not cancelled already
+    """
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import functools
+import threading
+
+import cv2
+import numpy as np
+
+
+class BackgroundModel:
+    """
+    A running average of the static hoop scene, to find the moving pixels of the ball.
+    The average is kept in fixed point (4 fractional bits in int16), so each update is a subtraction and a shift.
+    It is only kept for the region of interest of the hoop sector, which has to be the same for each frame.
+    Each thread-worker process has its own model, use :py:meth:`cached()` to get it. The threads of a thread pool
+    share the model of their process, so :py:meth:`apply()` is locked. A worker only sees every few
+    frames and maybe out of order: the update rate is raised for the skipped frames and older frames are only
+    compared, but not learned. The first frames are learned faster (about like a mean of all frames so far), so the
+    ball of the very first frame does not stay in the background for long.
+
+    :param rate: the update weight of one frame is 2^-rate, defaults to 5
+    :param threshold: the difference of one channel to the background to be foreground, defaults to 50
+    :param ignore: the channels which are not compared, e.g. the hue, which is noisy on grey pixels
+
+    :ivar background: the fixed point background, None until the first frame
+    :ivar latest_frame_number: the newest frame which was learned
+    :ivar learned: the amount of learned frames, skipped ones included
+    """
+    FRACTION_BITS = 4
+
+    def __init__(self, rate: int = 5, threshold: int = 50, ignore: tuple = ()):
+        self.rate = int(rate)
+        self.threshold = int(threshold) << self.FRACTION_BITS
+        self.ignore = tuple(ignore)
+        self.bounds = None
+        self.background = None
+        self.latest_frame_number = None
+        self.learned = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def cached(key: tuple, rate: int = 5, threshold: int = 50, ignore: tuple = ()) -> BackgroundModel:
+        """
+        Gives the model of this process for the key. A new key (e.g. a moved hoop) starts a new model.
+
+        :param key: any hashable which identifies the region of interest
+        :rtype: BackgroundModel
+        """
+        return BackgroundModel(rate, threshold, ignore)
+
+    def apply(self, roi, frame_number: int = None):
+        """
+        Compares the region of interest to the background and learns it afterwards, if the frame is newer than the
+        latest learned one. A ball which stops is learned into the background after about 2^rate frames.
+
+        :param roi: the region of interest of the frame, always the same rectangle
+        :param frame_number: the number of the frame, None counts as the next frame
+        :return: the foreground mask (0 or 255), None for the very first frame
+        :rtype: numpy.array | None
+        """
+        with self.lock:
+            current = roi.astype(np.int16)
+            current <<= self.FRACTION_BITS
+            if self.background is None or self.background.shape != current.shape:
+                self.background = current
+                self.latest_frame_number = frame_number
+                self.learned = 1
+                # the ignored channels get bounds which can not be exceeded
+                channels = roi.shape[2] if roi.ndim == 3 else 1
+                limit = 256 << self.FRACTION_BITS
+                self.bounds = (tuple(-limit if c in self.ignore else -self.threshold for c in range(channels)),
+                               tuple(limit if c in self.ignore else self.threshold for c in range(channels)))
+                return None
+            diff = cv2.subtract(current, self.background)
+            # in range of the background is not moving
+            foreground = cv2.bitwise_not(cv2.inRange(diff, *self.bounds))
+            if frame_number is None or self.latest_frame_number is None or frame_number > self.latest_frame_number:
+                gap = 1
+                if frame_number is not None and self.latest_frame_number is not None:
+                    gap = frame_number - self.latest_frame_number
+                self.learned += gap
+                # the weight of the n-th frame is about 1/n, until it is 2^-rate
+                rate = min(self.rate, self.learned.bit_length() - 1)
+                # n skipped frames with the weight 2^-rate each are about one update with n * 2^-rate
+                diff >>= max(rate - (gap.bit_length() - 1), 1)
+                cv2.add(self.background, diff, dst=self.background)
+                self.latest_frame_number = frame_number
+            return foreground
@@ -8,12 +8,17 @@ class Ball:
     :var hoop: the hoop this ball belongs to
     :var center: the tuple of coordinates from the center of the ball
     :var radius: the radius of the ball
+    :var precise_angle: the angle, if the detector measured it more precise than the integer center allows
+    :var confidence: how sure the detector is that this is the ball, between 0 and 1, if the detector tells
     """
-    def __init__(self, hoop: Hoop, center: tuple, radius: int):
+    def __init__(self, hoop: Hoop, center: tuple, radius: int, precise_angle: float = None,
+                 confidence: float = None):
         self.hoop = hoop
 
         self.center = tuple(center)
         self.radius = int(radius)
+        self.precise_angle = precise_angle
+        self.confidence = confidence
 
     def angle(self):
         """
@@ -21,4 +26,6 @@ class Ball:
 
         :return: the angle in float, calculated by his parent hoop :py:meth:`.Hoop.angle_in_hoop()`
         """
+        if self.precise_angle is not None:
+            return self.precise_angle
         return self.hoop.angle_in_hoop(self.center)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'storage', 'lut'))
+""" the directory where the tables are cached, storage/lut/ of the repository whatever the working directory is """
+
+
+class ColorTable:
+    """
+    A precomputed lookup table which maps a quantised BGR (or YUV) color directly to a label, so the masks for the ball
+    and the hoop markers can be generated without the conversion of the frame to HSV color space.
+    The table is built out of the HSV bounds from the config and cached on disk, keyed by the bounds.
+    Hue ranges which wrap around 180, like `lower: [150, ..]` and `upper: [180, ..]` or a lower hue which is bigger
+    than the upper hue, are handled, see :py:func:`in_hsv_range()`.
+    Per pixel the lookup is not faster than :py:func:`cv2.cvtColor()` plus :py:func:`cv2.inRange()`, it pays off
+    because only the searched region of the frame is looked up, while the whole frame has to be converted to HSV.
+
+    :param ball_hsv: the ball colors, a dict with `lower` and `upper` (H,S,V) values
+    :param hoop_hsv: the hoop marker colors, a dict with `lower` and `upper` (H,S,V) values, can be None
+    :param bits: the amount of bits per channel which are used for the lookup, 5 bits give a 32 KB table,
+        8 bits a 16 MB table without any quantisation
+    :param cache_dir: the directory where the tables are cached, None for no caching
+    :param color_space: the color space of the frames, either 'bgr' or 'yuv' (with the channel order Y, U, V)
+    :param luma: only for 'yuv', if False the table ignores the Y channel and labels a chroma if any luma matches
+
+    :ivar table: the flat table with 2^(3*bits) labels, indexed by (b << 2*bits) | (g << bits) | r (or y, u, v)
+    """
+
+    BACKGROUND = 0
+    """ the label of all colors which are neither ball nor hoop """
+
+    BALL = 1
+    """ the label bit of the ball colors """
+
+    HOOP = 2
+    """ the label bit of the hoop marker colors """
+
+    def __init__(self, ball_hsv: dict, hoop_hsv: dict = None, bits: int = 5, cache_dir=CACHE_DIR,
+                 color_space: str = 'bgr', luma: bool = True):
+        self.bits = int(bits)
+        if not 1 <= self.bits <= 8:
+            raise Exception('The color table needs 1 to 8 bits per channel, not ' + str(bits))
+        self.color_space = color_space
+        self.luma = luma or color_space != 'yuv'
+        self.table = None
+        path = None
+        if cache_dir is not None:
+            key = self.cache_key(ball_hsv, hoop_hsv, self.bits, self.color_space, self.luma)
+            path = os.path.join(cache_dir, key + '.npy')
+            if os.path.isfile(path):
+                self.table = np.load(path)
+        if self.table is None:
+            self.table = self.build(ball_hsv, hoop_hsv, self.bits, self.color_space, self.luma)
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.save(path, self.table)
+        # the table as 0 or 255 for every single label, so a mask is only one lookup
+        self.masks = {label: np.where(self.table & label, 255, 0).astype(np.uint8)
+                      for label in (self.BALL, self.HOOP)}
+
+    @staticmethod
+    def cache_key(ball_hsv: dict, hoop_hsv: dict, bits: int, color_space: str = 'bgr', luma: bool = True) -> str:
+        """
+        Gives a unique name for the given bounds and table settings
+
+        :rtype: str
+        """
+        key = repr((bits, _bounds(ball_hsv), _bounds(hoop_hsv), color_space, luma))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def build(ball_hsv: dict, hoop_hsv: dict, bits: int, color_space: str = 'bgr', luma: bool = True):
+        """
+        Builds the table. The center of each quantisation bin is converted to HSV and checked against the bounds.
+        This takes only a few milliseconds, because only 2^(3*bits) colors are converted. YUV bins are converted
+        like the I420 frames are, see :py:func:`_i420_to_bgr()`.
+        Without luma all luma bins of a chroma get the combined labels of all of them.
+
+        :return: the flat table array of labels
+        :rtype: numpy.array
+        """
+        n = 1 << bits
+        # the center of each bin
+        levels = ((np.arange(n) << (8 - bits)) + ((1 << (8 - bits)) >> 1)).astype(np.uint8)
+        c0, c1, c2 = np.meshgrid(levels, levels, levels, indexing='ij')
+        bins = np.stack([c0, c1, c2], axis=-1).reshape(n * n, n, 3)
+        if color_space == 'yuv':
+            bins = _i420_to_bgr(bins)
+        hsv = cv2.cvtColor(bins, cv2.COLOR_BGR2HSV)
+        table = np.zeros((n * n, n), dtype=np.uint8)
+        table[in_hsv_range(hsv, ball_hsv['lower'], ball_hsv['upper']) > 0] |= ColorTable.BALL
+        if hoop_hsv is not None:
+            table[in_hsv_range(hsv, hoop_hsv['lower'], hoop_hsv['upper']) > 0] |= ColorTable.HOOP
+        if not luma:
+            table = table.reshape(n, n, n)
+            table[:] = np.bitwise_or.reduce(table, axis=0)
+        return table.ravel()
+
+    def index(self, frame_bgr):
+        """
+        Calculates the table index of each pixel, only with shifts of the channel planes
+
+        :param frame_bgr: the frame (or a region of it) in BGR color space, or YUV for a 'yuv' table
+        :return: the index array in the frame size
+        """
+        shift = 8 - self.bits
+        c0, c1, c2 = cv2.split(frame_bgr)
+        index = (c0 >> shift).astype(np.uint16 if self.bits <= 5 else np.uint32)
+        index <<= self.bits
+        index |= c1 >> shift
+        index <<= self.bits
+        index |= c2 >> shift
+        return index
+
+    def labels(self, frame_bgr):
+        """
+        Looks up the label of each pixel, see :py:attr:`BALL` and :py:attr:`HOOP`
+
+        :param frame_bgr: the frame (or a region of it) in BGR color space
+        :return: the label array in the frame size
+        """
+        return self.table.take(self.index(frame_bgr))
+
+    def mask(self, frame_bgr, label: int):
+        """
+        Gives the mask of one label, like :py:func:`cv2.inRange()` does with the HSV frame
+
+        :param frame_bgr: the frame (or a region of it) in BGR color space
+        :param label: either :py:attr:`BALL` or :py:attr:`HOOP`
+        :return: the mask with 255 where the label is set, 0 otherwise
+        """
+        return self.masks[label].take(self.index(frame_bgr))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _cached(ball_bounds: tuple, hoop_bounds: tuple, bits: int, color_space: str, luma: bool) -> ColorTable:
+        ball_hsv = {'lower': ball_bounds[0], 'upper': ball_bounds[1]}
+        hoop_hsv = None if hoop_bounds is None else {'lower': hoop_bounds[0], 'upper': hoop_bounds[1]}
+        return ColorTable(ball_hsv, hoop_hsv, bits, color_space=color_space, luma=luma)
+
+    @staticmethod
+    def cached(ball_hsv: dict, hoop_hsv: dict = None, bits: int = 5, color_space: str = 'bgr',
+               luma: bool = True) -> ColorTable:
+        """
+        Gives the table for the bounds, it is only loaded (or built) once per process
+
+        :rtype: ColorTable
+        """
+        return ColorTable._cached(_bounds(ball_hsv), _bounds(hoop_hsv), int(bits), color_space, bool(luma))
+
+
+def in_hsv_range(frame_hsv, lower, upper):
+    """
+    Same as :py:func:`cv2.inRange()`, but hue ranges which wrap around 180 are split in two ranges.
+    A lower hue bigger than the upper hue, or an upper hue above 179, wraps around (e.g. 150 to 180 also contains 0).
+
+    :param frame_hsv: the frame in HSV color space
+    :param lower: the lower (H,S,V) bound
+    :param upper: the upper (H,S,V) bound
+    :return: the mask
+    """
+    lower = np.array(lower)
+    upper = np.array(upper)
+    if lower[0] <= upper[0] <= 179:
+        return cv2.inRange(frame_hsv, lower, upper)
+    upper_wrapped = upper.copy()
+    upper_wrapped[0] = upper[0] % 180
+    upper_high = upper.copy()
+    upper_high[0] = 179
+    lower_low = lower.copy()
+    lower_low[0] = 0
+    return cv2.bitwise_or(cv2.inRange(frame_hsv, lower, upper_high),
+                          cv2.inRange(frame_hsv, lower_low, upper_wrapped))
+
+
+def _i420_to_bgr(colors_yuv):
+    """
+    Converts YUV colors to BGR with the same (limited range BT.601) conversion as the I420 frames of
+    :py:func:`cv2.cvtColor()` use, the full range :py:data:`cv2.COLOR_YUV2BGR` gives other colors.
+    Each color becomes one chroma sample of an I420 frame with a 2x2 block of luma.
+
+    :param colors_yuv: the (h, w, 3) array of (Y, U, V) colors, h has to be even
+    :return: the (h, w, 3) array of BGR colors
+    """
+    h, w = colors_yuv.shape[:2]
+    y = np.repeat(np.repeat(colors_yuv[..., 0], 2, axis=0), 2, axis=1)
+    # the chroma planes follow the luma plane, each with half the rows of the full width
+    u = colors_yuv[..., 1].reshape(h // 2, 2 * w)
+    v = colors_yuv[..., 2].reshape(h // 2, 2 * w)
+    bgr = cv2.cvtColor(np.vstack([y, u, v]), cv2.COLOR_YUV2BGR_I420)
+    return bgr[::2, ::2]
+
+
+def _bounds(hsv: dict):
+    """ makes the bounds hashable """
+    if hsv is None:
+        return None
+    return tuple(int(v) for v in hsv['lower']), tuple(int(v) for v in hsv['upper'])
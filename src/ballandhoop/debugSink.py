@@ -0,0 +1,175 @@
+"""
+The debug sinks collect the intermediate pictures of a ball search. If debugging is disabled the shared
+:py:data:`NULL_SINK` is used, which does nothing at all, so the frame calculation does not pay for any color
+conversion or :py:class:`~.image.Image` wrapper it would throw away afterwards.
+If a :py:class:`~.debugWriter.DebugWriter` is registered with :py:func:`set_writer()`, the sinks are handed over to
+it instead of being saved in the search.
+"""
+
+from __future__ import annotations
+
+import os
+
+import cv2
+import numpy as np
+
+from src.ballandhoop.image import Image
+
+
+class NullDebugSink:
+    """
+    The sink which is used if no debug directory is given. Every method is a no-op.
+
+    :ivar enabled: always False, can be used to skip the preparation of debug only data
+    """
+
+    enabled = False
+
+    def capture(self, name: str, image_bw, rect: tuple = None):
+        pass
+
+    def capture_frame(self, frame, color_space: str = 'hsv', mask_scale: int = 1):
+        pass
+
+    def capture_result(self, hoop: Hoop, ball: Ball):
+        pass
+
+    def write(self):
+        pass
+
+
+NULL_SINK = NullDebugSink()
+"""
+The one and only instance of the :py:class:`NullDebugSink`
+"""
+
+# the writer of this process, see set_writer()
+_writer = None
+
+
+def set_writer(writer):
+    """
+    Registers the writer of this process, all sinks are handed over to it from then on
+
+    :param writer: the writer, None saves the sinks in the search again
+    :type writer: DebugWriter | None
+    """
+    global _writer
+    _writer = writer
+
+
+class DebugSink(NullDebugSink):
+    """
+    Captures the intermediate pictures of a ball search by reference. Nothing is converted or saved until
+    :py:meth:`write()` is called, so the pictures can also be handed to a later writer.
+
+    :param dir_path: the directory the pictures will be saved to
+
+    :ivar frame: the raw frame
+    :ivar color_space: the color space of the raw frame, either 'hsv', 'bgr' or 'yuv' (YUV420)
+    :ivar mask_scale: the factor the masks are downsampled by, compared to the raw frame
+    :ivar images: a list of (name, monochrome array, rect) tuples in the captured order
+    :ivar hoop: the hoop which was used for the search
+    :ivar ball: the found ball, if any
+    """
+
+    enabled = True
+
+    def __init__(self, dir_path: str):
+        self.dir_path = dir_path
+        self.frame = None
+        self.color_space = 'hsv'
+        self.mask_scale = 1
+        self.images = []
+        self.hoop = None
+        self.ball = None
+
+    def capture(self, name: str, image_bw, rect: tuple = None):
+        """
+        Remembers a monochrome picture, e.g. a mask
+
+        :param name: the filename the picture will be saved with
+        :param image_bw: the monochrome array, it must not be changed afterwards
+        :param rect: if the picture is only a region of interest, its (x, y, w, h) inside the frame
+        """
+        self.images.append((name, image_bw, rect))
+
+    def capture_frame(self, frame, color_space: str = 'hsv', mask_scale: int = 1):
+        """
+        Remembers the raw frame
+
+        :param frame: the frame array
+        :param color_space: the color space of the frame, either 'hsv', 'bgr' or 'yuv' (YUV420)
+        :param mask_scale: the factor the masks are downsampled by, compared to the raw frame
+        """
+        self.frame = frame
+        self.color_space = color_space
+        self.mask_scale = mask_scale
+
+    def capture_result(self, hoop: Hoop, ball: Ball):
+        """
+        Remembers the result of the search, which will be plotted into the raw frame
+
+        :param hoop: the hoop which was searched in
+        :param ball: the found ball or None
+        """
+        self.hoop = hoop
+        self.ball = ball
+
+    def write(self):
+        """
+        Hands the sink over to the registered writer (or drops it, if the writer is busy), saves it right away with
+        :py:meth:`save()` if there is no writer
+        """
+        if _writer is not None:
+            _writer.offer(self)
+        else:
+            self.save()
+
+    def save(self):
+        """
+        Converts and saves all captured pictures to the :py:attr:`dir_path`.
+        Pictures of a region of interest are placed in a black picture of the frame size, if the frame is known.
+        Downsampled masks are scaled up to the frame size.
+        """
+        os.makedirs(self.dir_path, exist_ok=True)
+        raw = None
+        if self.frame is not None:
+            if self.color_space == 'bgr':
+                # the result is plotted into the picture, so do not touch the frame itself
+                raw = Image(image_bgr=self.frame.copy())
+            elif self.color_space == 'yuv':
+                raw = Image(image_bgr=cv2.cvtColor(self.frame, cv2.COLOR_YUV2BGR_I420))
+            else:
+                raw = Image(image_hsv=self.frame)
+            raw.save(self.dir_path, 'raw')
+        for name, image_bw, rect in self.images:
+            if rect is not None and raw is not None:
+                x, y, w, h = rect
+                height, width = raw.image_bgr.shape[:2]
+                full = np.zeros((height // self.mask_scale, width // self.mask_scale), dtype=np.uint8)
+                full[y:y + h, x:x + w] = image_bw
+                image_bw = full
+            if self.mask_scale != 1:
+                image_bw = cv2.resize(image_bw, None, fx=self.mask_scale, fy=self.mask_scale,
+                                      interpolation=cv2.INTER_NEAREST)
+            Image(image_bw=image_bw).save(self.dir_path, name)
+        if raw is not None:
+            raw \
+                .plot_hoop(self.hoop) \
+                .plot_ball(self.ball) \
+                .plot_angle(self.ball) \
+                .save(self.dir_path, 'result')
+
+
+def debug_sink(dir_path: str = None) -> NullDebugSink:
+    """
+    Gives the matching sink for a debug directory
+
+    :param dir_path: the directory where debugging pictures will be saved, None if debugging is disabled
+    :return: a new :py:class:`DebugSink` or the shared :py:data:`NULL_SINK`
+    :rtype: DebugSink | NullDebugSink
+    """
+    if dir_path is None:
+        return NULL_SINK
+    return DebugSink(dir_path)
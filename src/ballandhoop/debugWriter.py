@@ -0,0 +1,167 @@
+"""
+The debug pictures of the sampled frames are saved by a writer process of their own, so the thread-workers only
+capture them by reference and hand them over, see :py:class:`DebugWriter`. Which frames are sampled is decided by
+the :py:class:`DebugSampler` in the main loop.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+
+
+class DebugWriter:
+    """
+    Saves the :py:class:`~.debugSink.DebugSink` of the sampled frames in a separate process. The sinks are sent
+    through a bounded queue, if it is full the sink is dropped instead of waiting. The thread-workers get the writer
+    through the pool initializer and register it with :py:func:`~.debugSink.set_writer()`.
+
+    :param queue_size: the maximal amount of sinks waiting for the writer process
+
+    :ivar queue: the queue of the sinks, None stops the writer process
+    :ivar written: the shared amount of saved sinks
+    :ivar dropped: the shared amount of sinks which were dropped, because the queue was full
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue = multiprocessing.Queue(maxsize=int(queue_size))
+        self.written = multiprocessing.Value('i', 0)
+        self.dropped = multiprocessing.Value('i', 0)
+        self.process = multiprocessing.Process(target=write_loop, args=(self.queue, self.written),
+                                               name='debug-writer', daemon=True)
+        self.process.start()
+
+    def offer(self, sink) -> bool:
+        """
+        Hands a sink over to the writer process, without waiting
+
+        :param sink: the sink with the captured pictures
+        :type sink: DebugSink
+        :return: flag if the sink was taken, False if it was dropped
+        """
+        if sink.frame is not None:
+            # the frame may be a slot of a ring, which is used again as soon as the search is done
+            sink.frame = sink.frame.copy()
+        try:
+            self.queue.put_nowait(sink)
+            return True
+        except queue.Full:
+            with self.dropped.get_lock():
+                self.dropped.value += 1
+            return False
+
+    def close(self):
+        """
+        Stops the writer process after the waiting sinks are saved, but waits at most a few seconds
+        """
+        try:
+            self.queue.put(None, timeout=5)
+        except queue.Full:
+            pass
+        self.process.join(timeout=10)
+
+
+def write_loop(sinks, written):
+    """
+    The loop of the writer process: saves the sinks until None arrives
+
+    :param sinks: the queue of the sinks
+    :param written: the shared counter of the saved sinks
+    """
+    try:
+        # the writer is the least important process, the tracking comes first
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass
+    while True:
+        sink = sinks.get()
+        if sink is None:
+            return
+        try:
+            sink.save()
+        except Exception as e:
+            traceback.print_exception(type(e), e, e.__traceback__)
+        with written.get_lock():
+            written.value += 1
+
+
+class DebugSampler:
+    """
+    Decides which frames are saved as debug pictures. A frame is sampled, if any policy says so:
+
+    - every n-th frame
+    - one frame after at least `interval` seconds
+    - the frame after an anomaly: the ball got lost, a result came in the wrong order or the radius of the ball is
+      out of range. The anomaly is only known after its frame was searched, so the next frame is taken.
+
+    :param every: every this many frames one is sampled, 0 for none
+    :param interval: the seconds between two sampled frames, 0 for none
+    :param anomalies: flag if the frame after an anomaly is sampled
+    :param min_radius: a smaller ball is an anomaly
+    :param max_radius: a bigger ball is an anomaly
+    :param kwargs: catch-all parameter, so more entries in the config do not throw an error
+
+    :ivar anomaly: the reason of the latest anomaly which is not sampled yet, None if there is none
+    :ivar sampled: the amount of sampled frames per reason
+    """
+
+    def __init__(self, every: int = 30, interval: float = 0, anomalies: bool = True, min_radius: int = 0,
+                 max_radius: int = None, **kwargs):
+        self.every = int(every)
+        self.interval = float(interval)
+        self.anomalies = bool(anomalies)
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self.lock = threading.Lock()
+        self.latest_time = 0
+        self.found = None
+        self.anomaly = None
+        self.sampled = {}
+
+    def sample(self, frame_number: int) -> str | None:
+        """
+        Called for each frame in the main loop
+
+        :param frame_number: the number of the frame
+        :return: the reason why the frame is sampled, None if it is not sampled
+        """
+        now = time.monotonic()
+        reason = None
+        with self.lock:
+            if self.anomaly is not None:
+                reason, self.anomaly = self.anomaly, None
+        if reason is None and self.every > 0 and frame_number % self.every == 0:
+            reason = 'every'
+        if reason is None and self.interval > 0 and now - self.latest_time >= self.interval:
+            reason = 'interval'
+        if reason is not None:
+            self.latest_time = now
+            self.sampled[reason] = self.sampled.get(reason, 0) + 1
+        return reason
+
+    def report(self, ball=None, wrong_order: bool = False):
+        """
+        Called for each result, to find the anomalies
+
+        :param ball: the found ball, if any
+        :param wrong_order: flag if the result came in the wrong order
+        """
+        if not self.anomalies:
+            return
+        anomaly = None
+        if wrong_order:
+            anomaly = 'wrong order'
+        elif ball is None:
+            if self.found:
+                anomaly = 'ball lost'
+        elif ball.radius < self.min_radius or (self.max_radius is not None and ball.radius > self.max_radius):
+            anomaly = 'radius'
+        with self.lock:
+            if not wrong_order:
+                self.found = ball is not None
+            if anomaly is not None:
+                self.anomaly = anomaly
@@ -0,0 +1,590 @@
+from __future__ import annotations
+
+import math
+
+import cv2
+import numpy as np
+
+from src.ballandhoop import helper
+from src.ballandhoop.backgroundModel import BackgroundModel
+from src.ballandhoop.ball import Ball
+from src.ballandhoop.colorTable import ColorTable
+from src.ballandhoop.debugSink import debug_sink, NULL_SINK
+from src.ballandhoop.hoop import Hoop, circle_fill, intersect_rects, rect_contains_circle
+
+# all known detector engines by their name in the ball config, see register()
+DETECTORS = {}
+
+
+def register(name: str):
+    """
+    Class decorator which adds a detector engine to :py:data:`DETECTORS`, so it can be chosen in the ball config
+    with `detector: <name>`
+
+    :param name: the name of the engine in the config
+    """
+    def decorator(cls):
+        cls.name = name
+        DETECTORS[name] = cls
+        return cls
+    return decorator
+
+
+def create_detector(hoop: Hoop, ball_config: dict, shape: tuple = None) -> Detector:
+    """
+    Creates the detector engine which is chosen by the `detector` key of the ball config, 'contours' if unset
+
+    :param hoop: the hoop the ball is searched in
+    :param ball_config: the ball config of this host
+    :param shape: the shape of the frames, if known the precomputation is done at once
+    :rtype: Detector
+    """
+    name = ball_config.get('detector') or 'contours'
+    if name not in DETECTORS:
+        raise Exception('Unknown detector "' + str(name) + '", known are: ' + ', '.join(DETECTORS.keys()))
+    return DETECTORS[name](hoop, ball_config, shape)
+
+
+class Detector:
+    """
+    The interface all detector engines share: a frame goes in, a :py:class:`.Ball` with center, radius, angle and
+    confidence (or None) comes out. Everything an engine needs besides the frame (masks, tables, maps) is prepared
+    in :py:meth:`prepare()` once the frame shape is known, :py:meth:`detect()` only reads it.
+    The precomputed data is not pickled: each thread-worker keeps its own engine, see :py:mod:`~.poolWorker`.
+
+    The search of all engines goes like this: the frame is filtered with the ball colors to a mask. This mask is
+    morphed, depending on the given iterations. There will be a dilatation and an erode afterwards (closure), to
+    close holes in the found ball mask which will be there because of the physical hoop.
+    Only the bounding rectangle of the hoop :py:attr:`~.Hoop.fov` sector is processed, see
+    :py:meth:`.Hoop.sector_mask()`, and all mask points outside the sector are removed.
+    In this final mask each engine locates the ball its own way, see :py:meth:`locate()`.
+    If a search window is given, only the part of the sector inside this window is searched first. If the ball is
+    not found there (or touches the window border) the whole sector is searched.
+    If the color table is used, the frame has to be in BGR color space and the ball mask is looked up in the
+    :py:class:`~.colorTable.ColorTable` instead, so the frame does not need to be converted to HSV at all.
+    If the frame is a raw YUV420 frame, the search is done in the resolution of its chroma planes (a quarter of
+    the pixels) with a color table in YUV color space, which is built out of the same HSV colors.
+    In this resolution a few scattered pixels already span the min_radius, so a blob needs an area of at least half
+    the min_radius circle too. Without the luma (`yuv_luma` False) gray and dark pixels take the color of their
+    chroma, this is not suited for cluttered scenes.
+    With pyramid levels, the ball is searched in a frame which is downsampled by 2^levels first, and only
+    refined in a small window of the full frame around it, like a given search window. If there is no candidate in
+    the downsampled frame, or no ball in the window around it, the whole sector is searched. A given search window
+    is preferred over the pyramid search.
+
+    :param hoop: the hoop the ball is searched in
+    :param ball_config: the ball config with these keys (all but `hsv` are optional):
+
+        - `hsv`: a dictionary with `upper` and `lower` and (H,S,V) values, which the frame will be filtered to
+        - `morph_iterations`: the amount of iterations to morph, defaults to 1
+        - `min_radius`: the minimal radius a ball is allowed to have, defaults to 5
+        - `max_radius`: the maximal radius a ball is allowed to have, defaults to 20
+        - `color_table`: flag if the frames are BGR and the ball mask is looked up in the color table
+        - `color_table_bits`: the bits per channel of the color table, defaults to 5
+        - `yuv`: flag if the frames are YUV420, see :py:func:`~.helper.yuv_planes()`
+        - `yuv_luma`: flag if the luma is used in addition to the chroma planes for the yuv search, defaults to True
+        - `pyramid_levels`: the amount of halvings for the coarse search, 0 disables it, defaults to 0
+        - the keys of the single engines, see there
+    :param shape: the shape of the frames as delivered by the camera, if known
+
+    :ivar shape: the shape the engine is prepared for, None if not prepared yet
+    :ivar hsv: the colors the ball mask is filtered with, None if there are none
+    :ivar table: the color table, if the config uses one
+    :ivar sector: the sector mask and its rectangle, see :py:meth:`.Hoop.sector_mask()`
+    :ivar coarse_sector: the sector mask and its rectangle in the downsampled frame of the pyramid search
+    """
+    name = None
+
+    def __init__(self, hoop: Hoop, ball_config: dict, shape: tuple = None):
+        self.hoop = hoop
+        self.config = dict(ball_config, detector=self.name)
+        self.hsv = self.color_bounds()
+        self.morph_iterations = int(self.config.get('morph_iterations', 1))
+        self.min_radius = self.config.get('min_radius', 5)
+        self.max_radius = self.config.get('max_radius', 20)
+        self.pyramid_levels = int(self.config.get('pyramid_levels') or 0)
+        self.shape = None
+        self.table = None
+        self.sector = None
+        self.coarse_sector = None
+        if shape is not None:
+            self.prepare(shape)
+
+    def __getstate__(self):
+        return {'hoop': self.hoop, 'config': self.config, 'shape': self.shape}
+
+    def __setstate__(self, state):
+        self.__init__(state['hoop'], state['config'], state['shape'])
+
+    def color_bounds(self):
+        """
+        :return: the colors the ball mask is filtered with, None if there are none
+        :rtype: dict | None
+        """
+        return self.config['hsv']
+
+    def scale(self):
+        """
+        :return: the factor the searched frame is downsampled by, compared to the camera frame
+        :rtype: int
+        """
+        return 2 if self.config.get('yuv') else 1
+
+    def search_shape(self, shape):
+        """
+        :param shape: the shape of the camera frame
+        :return: the shape of the frame which is searched, the chroma planes for yuv frames
+        :rtype: tuple
+        """
+        if self.config.get('yuv'):
+            # I420 has 1.5 rows per pixel row, the chroma planes half the width and height
+            return shape[0] * 2 // 3 // 2, shape[1] // 2
+        return tuple(shape[:2])
+
+    def prepare(self, shape):
+        """
+        Does the precomputation for frames of this shape. Called by the constructor, if the shape is given, and by
+        :py:meth:`detect()` if the shape of the frames changes.
+
+        :param shape: the shape of the camera frames
+        """
+        self.shape = tuple(shape)
+        bits = self.config.get('color_table_bits', 5)
+        if self.hsv is not None and self.config.get('yuv'):
+            self.table = ColorTable.cached(self.hsv, self.hoop.hsv, bits, color_space='yuv',
+                                           luma=self.config.get('yuv_luma', True))
+        elif self.hsv is not None and self.config.get('color_table'):
+            self.table = ColorTable.cached(self.hsv, self.hoop.hsv, bits)
+        size = self.search_shape(shape)
+        self.sector = self.hoop.sector_mask(size, self.scale())
+        if self.pyramid_levels > 0:
+            factor = 2 ** self.pyramid_levels
+            # the size of the strided slice of the frame
+            coarse = (-(-size[0] // factor), -(-size[1] // factor))
+            self.coarse_sector = self.hoop.sector_mask(coarse, self.scale() * factor)
+
+    def detect(self, frame, frame_number: int = None, dir_path: str = None, search_window: tuple = None):
+        """
+        Searches the ball in the frame
+
+        :param frame: the frame as delivered by the camera
+        :param frame_number: the number of the frame, some engines need it to handle skipped frames
+        :param dir_path: the directory where debugging pictures will be saved, if any
+        :param search_window: the predicted search window of the :py:class:`~.tracker.BallTracker`, if any
+        :return: the found ball, if any
+        :rtype: Ball | None
+        """
+        if self.shape != frame.shape:
+            self.prepare(frame.shape)
+        # the null sink is used if dir_path is None, which does nothing at all
+        debug = debug_sink(dir_path)
+        if self.config.get('yuv'):
+            debug.capture_frame(frame, color_space='yuv', mask_scale=2)
+            # the chroma planes only have half the width and height, so the whole search is done in that size
+            frame = helper.yuv_quarter(frame, luma=self.config.get('yuv_luma', True))
+        else:
+            debug.capture_frame(frame, color_space='bgr' if self.config.get('color_table') else 'hsv')
+        ball = self.search(frame, debug, frame_number, search_window)
+        # converts and saves the captured pictures and a result picture, if debug dir path is set
+        debug.capture_result(self.hoop, ball)
+        debug.write()
+        return ball
+
+    def search(self, frame, debug, frame_number: int = None, search_window: tuple = None):
+        """
+        Searches the ball in the search window first, if any, and in the whole sector afterwards
+
+        :param frame: the frame in the searched color space and size
+        :param debug: the debug sink, see :py:func:`~.debugSink.debug_sink()`
+        :param frame_number: the number of the frame
+        :param search_window: a rectangle (x, y, w, h) in hoop coordinates where the ball is expected
+        :return: the found ball, if any
+        :rtype: Ball | None
+        """
+        scale = self.scale()
+        if self.pyramid_levels > 0 and search_window is None:
+            # without a candidate in the downsampled frame, the whole sector is searched below
+            search_window = self.pyramid_window(frame)
+        min_radius, max_radius = self.min_radius / scale, self.max_radius / scale
+        mask_hoop, rect = self.sector
+        ball = None
+        window = self.scaled_window(search_window)
+        if window is not None:
+            x, y, w, h = window
+            sx, sy = x - rect[0], y - rect[1]
+            mask = self.ball_mask(frame, mask_hoop[sy:sy + h, sx:sx + w], window, self.morph_iterations, debug)
+            ball = self.window_ball(self.locate(mask, window, scale, min_radius, max_radius), window)
+        if ball is None:
+            # no window or the ball is lost, fall back to the full sector
+            mask = self.ball_mask(frame, mask_hoop, rect, self.morph_iterations, debug, frame_number)
+            if mask is not None:
+                ball = self.locate(mask, rect, scale, min_radius, max_radius)
+        # returns None if there was no valid ball in the mask, the first found ball otherwise
+        return ball
+
+    def scaled_window(self, search_window):
+        """
+        :param search_window: a rectangle (x, y, w, h) in hoop coordinates, or None
+        :return: the part of the sector rectangle inside the window in the searched frame, None if there is none
+        :rtype: (int, int, int, int) | None
+        """
+        if search_window is None:
+            return None
+        scale = self.scale()
+        x, y, w, h = search_window
+        return intersect_rects(self.sector[1], (x // scale, y // scale, -(-w // scale), -(-h // scale)))
+
+    def window_ball(self, ball, window):
+        """
+        :param ball: the ball which was found in the window, if any
+        :param window: the window in the searched frame, see :py:meth:`scaled_window()`
+        :return: the ball, None if it was cut by the window, because its center would be wrong
+        :rtype: Ball | None
+        """
+        scale = self.scale()
+        if ball is None or not rect_contains_circle(window, (ball.center[0] / scale, ball.center[1] / scale),
+                                                     ball.radius / scale, self.sector[1]):
+            return None
+        return ball
+
+    def pyramid_window(self, frame):
+        """
+        Does the coarse search of :py:meth:`search()` in the frame downsampled by 2^levels.
+        The frame is only sliced (nearest neighbour), because averaging the hue would create colors which are not in
+        the frame at all. Instead of the morphing, the coarse mask is smoothed with a 3x3 median, which removes the
+        single pixel speckles of the noise, but keeps a ball which is at least two coarse pixels wide. The radii are
+        scaled down, but a candidate has to be at least one coarse pixel big. The coarse candidate is only a blob of
+        :py:meth:`.Hoop.blob_from_contours()`, whatever the engine, because it is only used for the window.
+
+        :param frame: the frame in the searched color space and size
+        :return: the search window (x, y, w, h) in hoop coordinates around the candidate, or None if there is none
+        :rtype: (int, int, int, int) | None
+        """
+        factor = 2 ** self.pyramid_levels
+        coarse_scale = self.scale() * factor
+        mask_hoop, rect = self.coarse_sector
+        x, y, w, h = rect
+        if w == 0 or h == 0:
+            return None
+        # the coarse pictures would not fit onto the debug canvas, so they are not captured
+        mask = self.color_mask(frame[y * factor:(y + h) * factor:factor, x * factor:(x + w) * factor:factor], rect,
+                               NULL_SINK)
+        mask = cv2.bitwise_and(mask_hoop, cv2.medianBlur(mask, 3))
+        found = Hoop.blob_from_contours(mask, rect, max(self.min_radius / coarse_scale, 1),
+                                        self.max_radius / coarse_scale)
+        if found is None:
+            return None
+        (cx, cy), radius, _ = found
+        # one coarse pixel of uncertainty on each side plus one for the median
+        half = int(radius * coarse_scale) + 2 * coarse_scale
+        cx, cy = int(cx * coarse_scale + (coarse_scale - 1) / 2), int(cy * coarse_scale + (coarse_scale - 1) / 2)
+        return cx - half, cy - half, 2 * half + 1, 2 * half + 1
+
+    def color_mask(self, roi, roi_rect, debug, frame_number: int = None):
+        """
+        Filters a region of the frame with the ball colors
+
+        :param roi: the region of the frame
+        :param roi_rect: the rectangle (x, y, w, h) of the region inside the frame, for the debug pictures
+        :param debug: the debug sink, see :py:func:`~.debugSink.debug_sink()`
+        :param frame_number: the number of the frame
+        :return: the mask of the region, None if there can not be a ball in it
+        """
+        if self.table is not None:
+            return self.table.mask(roi, ColorTable.BALL)
+        return cv2.inRange(roi, np.array(self.hsv['lower']), np.array(self.hsv['upper']))
+
+    def ball_mask(self, frame, mask_hoop, rect, morph_iterations, debug, frame_number: int = None):
+        """
+        Builds the final mask of a rectangle of the frame: the color mask of :py:meth:`color_mask()`, closed by the
+        morphing and cut to the hoop sector.
+
+        :param frame: the full (maybe downsampled) frame
+        :param mask_hoop: the sector mask cropped to the rectangle
+        :param rect: the rectangle (x, y, w, h) inside the frame
+        :param morph_iterations: the amount of iterations to morph
+        :param debug: the debug sink, see :py:func:`~.debugSink.debug_sink()`
+        :param frame_number: the number of the frame
+        :return: the final mask of the rectangle, None if there can not be a ball in it
+        """
+        x, y, w, h = rect
+        if w == 0 or h == 0:
+            return None
+        # pad the region of interest, so the morphing at its border gives the same result as on the full frame
+        pad = 2 * max(morph_iterations, 0)
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1, y1 = min(x + w + pad, frame.shape[1]), min(y + h + pad, frame.shape[0])
+        roi_rect = (x0, y0, x1 - x0, y1 - y0)
+        mask_ball = self.color_mask(frame[y0:y1, x0:x1], roi_rect, debug, frame_number)
+        if mask_ball is None:
+            return None
+        debug.capture('ball-mask', mask_ball, roi_rect)
+        if morph_iterations > 0:
+            mask_ball = cv2.dilate(mask_ball, None, iterations=morph_iterations)
+            debug.capture('ball-mask-dil', mask_ball, roi_rect)
+            mask_ball = cv2.erode(mask_ball, None, iterations=morph_iterations)
+            debug.capture('ball-mask-dil-erode', mask_ball, roi_rect)
+        # remove the padding again
+        mask_ball = mask_ball[y - y0:y - y0 + h, x - x0:x - x0 + w]
+        mask = cv2.bitwise_and(mask_hoop, mask_ball)
+        debug.capture('segment-mask', mask_hoop, rect)
+        debug.capture('final-mask', mask, rect)
+        return mask
+
+    def locate(self, mask, rect, scale, min_radius, max_radius):
+        """
+        Locates the ball in the final mask of a rectangle, each engine does this its own way
+
+        :param mask: the final mask of the rectangle
+        :param rect: the rectangle (x, y, w, h) of the mask inside the (maybe downsampled) frame
+        :param scale: the factor the frame is downsampled by, compared to the hoop coordinates
+        :param min_radius: the minimal radius a ball is allowed to have, in frame pixels
+        :param max_radius: the maximal radius a ball is allowed to have, in frame pixels
+        :return: the found ball in hoop coordinates, if any
+        :rtype: Ball | None
+        """
+        raise NotImplementedError()
+
+    def ball_from_blob(self, found, scale):
+        """
+        Scales a blob of :py:meth:`.Hoop.blob_from_contours()` or :py:meth:`.Hoop.blob_from_components()` back to
+        the hoop coordinates
+
+        :param found: the centroid, the radius and the area of the blob in frame coordinates, or None
+        :param scale: the factor the frame is downsampled by, compared to the hoop coordinates
+        :rtype: Ball | None
+        """
+        if found is None:
+            return None
+        (cx, cy), radius, area = found
+        if self.config.get('yuv') and area < math.pi * (self.min_radius / scale) ** 2 / 2:
+            # the biggest fitting blob is too small, so all others are as well
+            return None
+        # a downsampled pixel covers scale pixels in each direction, so shift to the middle of them
+        center_ball = (int(cx * scale + (scale - 1) / 2), int(cy * scale + (scale - 1) / 2))
+        return Ball(self.hoop, center_ball, int(radius * scale), confidence=circle_fill(area, radius))
+
+
+@register('contours')
+class ContourDetector(Detector):
+    """
+    Searches the biggest contour in the color mask, see :py:meth:`.Hoop.blob_from_contours()`
+    """
+
+    def locate(self, mask, rect, scale, min_radius, max_radius):
+        return self.ball_from_blob(Hoop.blob_from_contours(mask, rect, min_radius, max_radius), scale)
+
+
+@register('components')
+class ComponentDetector(Detector):
+    """
+    Searches the biggest connected component in the color mask, see :py:meth:`.Hoop.blob_from_components()`
+    """
+
+    def locate(self, mask, rect, scale, min_radius, max_radius):
+        return self.ball_from_blob(Hoop.blob_from_components(mask, rect, min_radius, max_radius), scale)
+
+
+@register('anglemap')
+class AngleMapDetector(Detector):
+    """
+    Takes the ball angle directly as the circular mean of the directions of the ball pixels, see
+    :py:meth:`.Hoop.angle_map()`. These are only masked means (cos, sin and the distance), there are no contours
+    and no rounded centroid, so the angle has sub-degree precision. The mask is not morphed, the sums do not need a
+    closed blob.
+    The mean of every second pixel of the whole mask only places a window of the `max_radius` ball, the ball pixels
+    are summed inside this window, which is moved to their mean once more. So speckles elsewhere in the sector do not
+    pull the mean off the ball. The window has to contain the area of a ball between half a `min_radius` ball and a
+    `max_radius` ball, and its pixels must not be spread more than four times a disk of the same area. The radius is
+    the one of a circle with the area of the window pixels.
+    The confidence is the amount of ball pixels compared to a ball with `min_radius` (at most 1), multiplied by
+    the length of the mean direction.
+
+    :ivar maps: the direction maps and their rectangle, see :py:meth:`.Hoop.angle_map()`
+    :ivar coarse_maps: every second pixel of the maps in both directions, with the same rectangle
+    """
+
+    def __init__(self, hoop: Hoop, ball_config: dict, shape: tuple = None):
+        self.maps = None
+        self.coarse_maps = None
+        super().__init__(hoop, dict(ball_config, morph_iterations=0), shape)
+
+    def prepare(self, shape):
+        super().prepare(shape)
+        self.maps = self.hoop.angle_map(self.search_shape(shape), self.scale())
+        maps, rect = self.maps
+        self.coarse_maps = np.ascontiguousarray(maps[::2, ::2]), rect
+
+    def sums(self, mask, rect, window, coarse=False):
+        """
+        Sums the maps under the mask pixels of a window
+
+        :param mask: the final mask of the rectangle
+        :param rect: the rectangle (x, y, w, h) of the mask inside the (maybe downsampled) frame
+        :param window: the rectangle (x, y, w, h) inside rect which is summed
+        :param coarse: if True only every second pixel in both directions is summed
+        :return: the amount of summed mask pixels and the mean of their (cos, sin, distance), None if there are none
+        :rtype: (int, tuple | None)
+        """
+        maps, (sx, sy, _, _) = self.coarse_maps if coarse else self.maps
+        x, y, w, h = window
+        blob = mask[y - rect[1]:y - rect[1] + h, x - rect[0]:x - rect[0] + w]
+        mx, my = x - sx, y - sy
+        if coarse:
+            # start at the pixels which are in the coarse maps
+            blob = np.ascontiguousarray(blob[my % 2::2, mx % 2::2])
+            mx, my = -(-mx // 2), -(-my // 2)
+            h, w = blob.shape
+        count = cv2.countNonZero(blob)
+        if count == 0:
+            return 0, None
+        return count, cv2.mean(maps[my:my + h, mx:mx + w], mask=blob)[:3]
+
+    def locate(self, mask, rect, scale, min_radius, max_radius):
+        min_area = math.pi * min_radius * min_radius
+        count, mean = self.sums(mask, rect, rect, coarse=True)
+        # allow a ball which is covered half by the hoop, the coarse sum only has every fourth pixel
+        if count * 4 < min_area / 2:
+            return None
+        half = int(max_radius) + 1
+        window = None
+        for _ in range(2):
+            angle = math.atan2(mean[1], mean[0])
+            distance = mean[2] / scale
+            # the direction (0, 1) has the angle 0, see angle_in_hoop()
+            cx = self.hoop.center[0] / scale - distance * math.sin(angle)
+            cy = self.hoop.center[1] / scale + distance * math.cos(angle)
+            window = intersect_rects(rect, (int(cx) - half, int(cy) - half, 2 * half + 1, 2 * half + 1))
+            if window is None:
+                return None
+            count, mean = self.sums(mask, rect, window)
+            if count < min_area / 2:
+                return None
+        if count > math.pi * max_radius * max_radius:
+            return None
+        x, y, w, h = window
+        moments = cv2.moments(mask[y - rect[1]:y - rect[1] + h, x - rect[0]:x - rect[0] + w], binaryImage=True)
+        # the pixels of a disk are spread around their centroid with a variance of count / 2pi
+        if (moments['mu20'] + moments['mu02']) / count > 2 * count / math.pi:
+            return None
+        resultant = math.hypot(mean[0], mean[1])
+        angle = math.atan2(mean[1], mean[0])
+        center = (int(round(self.hoop.center[0] - mean[2] * math.sin(angle))),
+                  int(round(self.hoop.center[1] + mean[2] * math.cos(angle))))
+        confidence = min(count / min_area, 1.0) * resultant
+        return Ball(self.hoop, center, int(math.sqrt(count / math.pi) * scale),
+                    precise_angle=angle / math.pi * 180 + self.hoop.angle_offset, confidence=confidence)
+
+
+@register('polar')
+class PolarDetector(Detector):
+    """
+    Searches the ball only in the ring just inside the hoop, where the ball rolls. The ring is unwrapped into a
+    narrow strip, see :py:class:`~.polarUnwrap.PolarUnwrap`, and only this strip is thresholded.
+    The angle is taken from the column profile of the strip mask with sub-degree precision,
+    the center of the returned ball is only rounded for plotting. Search windows and the pyramid search are not
+    used, the strip is small anyway.
+    The ball has to be one contiguous run of columns, its radius is given by the extent of this run and has to fit
+    the radius limits.
+    The config keys `polar_band` (the width of the ring in pixels, defaults to 2 * max_radius) and `polar_step`
+    (the angle of one column of the strip in degree, defaults to 0.5) are used in addition.
+
+    :ivar polar: the :py:class:`~.polarUnwrap.PolarUnwrap` of the ring
+    """
+
+    def __init__(self, hoop: Hoop, ball_config: dict, shape: tuple = None):
+        self.band = ball_config.get('polar_band') or 2 * ball_config.get('max_radius', 20)
+        self.step = ball_config.get('polar_step', 0.5)
+        self.polar = None
+        super().__init__(hoop, ball_config, shape)
+
+    def prepare(self, shape):
+        super().prepare(shape)
+        self.polar = self.hoop.polar_unwrap(self.search_shape(shape), self.scale(), self.band, self.step)
+
+    def search(self, frame, debug, frame_number: int = None, search_window: tuple = None):
+        scale = self.scale()
+        strip = self.polar.unwrap(frame)
+        if self.table is not None:
+            mask = self.table.mask(strip, ColorTable.BALL)
+        else:
+            mask = cv2.inRange(strip, np.array(self.hsv['lower']), np.array(self.hsv['upper']))
+        debug.capture('polar-mask', mask)
+        if self.morph_iterations > 0:
+            mask = cv2.dilate(mask, None, iterations=self.morph_iterations)
+            mask = cv2.erode(mask, None, iterations=self.morph_iterations)
+            debug.capture('polar-mask-dil-erode', mask)
+        # the chord of a min_radius ball is at least half its radius over nearly its whole width
+        found = self.polar.locate(mask, max(int(self.min_radius / scale / 2), 2))
+        if found is None:
+            return None
+        theta, distance, radius, count = found
+        if not self.min_radius <= radius * scale <= self.max_radius:
+            return None
+        center = (self.hoop.center[0] / scale, self.hoop.center[1] / scale)
+        point = (center[0] + distance * math.cos(math.radians(theta)),
+                 center[1] + distance * math.sin(math.radians(theta)))
+        point = (point[0] * scale + (scale - 1) / 2, point[1] * scale + (scale - 1) / 2)
+        # the angle goes through the same offset handling, but with the exact point instead of the rounded center
+        # a strip pixel covers the arc of one column
+        area = count * math.radians(self.step) * distance
+        return Ball(self.hoop, (int(round(point[0])), int(round(point[1]))), int(radius * scale),
+                    precise_angle=self.hoop.angle_in_hoop(point), confidence=circle_fill(area, radius))
+
+
+@register('background')
+class BackgroundDetector(ContourDetector):
+    """
+    Searches the moving ball with the difference to a :py:class:`~.backgroundModel.BackgroundModel` of the hoop
+    sector. The moving pixels are gated by the colors, the loose `background_hsv` if set or the ball `hsv`
+    otherwise, so other moving things or a changing light are not taken for the ball. The model has to see the whole
+    sector each frame, so the mask is always built for all of it. A search window only decides where the ball is
+    looked for first, the pyramid search is not done at all. The biggest moving blob is taken, like in
+    :py:class:`ContourDetector`.
+    The config keys `background_hsv`, `background_rate` (the background learns with a weight of 2^-rate per frame,
+    defaults to 5) and `background_threshold` (the difference to the background to be moving, defaults to 50) are
+    used in addition.
+
+    :ivar model: the background model of this process, shared by the threads of a thread pool
+    """
+
+    def __init__(self, hoop: Hoop, ball_config: dict, shape: tuple = None):
+        self.model = None
+        super().__init__(hoop, dict(ball_config, pyramid_levels=0), shape)
+
+    def color_bounds(self):
+        return self.config.get('background_hsv') or self.config['hsv']
+
+    def prepare(self, shape):
+        super().prepare(shape)
+        _, rect = self.sector
+        # hue is noisy on grey pixels, so only saturation and value are compared on hsv frames
+        ignore = (0,) if not self.config.get('yuv') and not self.config.get('color_table') else ()
+        self.model = BackgroundModel.cached((rect, self.search_shape(shape), self.morph_iterations),
+                                            self.config.get('background_rate', 5),
+                                            self.config.get('background_threshold', 50), ignore)
+
+    def search(self, frame, debug, frame_number: int = None, search_window: tuple = None):
+        scale = self.scale()
+        min_radius, max_radius = self.min_radius / scale, self.max_radius / scale
+        mask_hoop, rect = self.sector
+        mask = self.ball_mask(frame, mask_hoop, rect, self.morph_iterations, debug, frame_number)
+        if mask is None:
+            return None
+        window = self.scaled_window(search_window)
+        if window is not None:
+            x, y, w, h = window
+            sx, sy = x - rect[0], y - rect[1]
+            ball = self.window_ball(self.locate(mask[sy:sy + h, sx:sx + w], window, scale, min_radius, max_radius),
+                                    window)
+            if ball is not None:
+                return ball
+        return self.locate(mask, rect, scale, min_radius, max_radius)
+
+    def color_mask(self, roi, roi_rect, debug, frame_number: int = None):
+        moving = self.model.apply(roi, frame_number)
+        if moving is None:
+            # the very first frame is only learned
+            return None
+        debug.capture('moving-mask', moving, roi_rect)
+        return cv2.bitwise_and(moving, super().color_mask(roi, roi_rect, debug, frame_number))
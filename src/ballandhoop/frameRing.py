@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import queue
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# the rings known in this process by their shared memory name, so a ring is only attached once per process
+_rings = {}
+
+
+class FrameRing:
+    """
+    A fixed amount of frame slots in shared memory, so the frames do not have to be pickled for the thread-workers.
+    The :py:class:`~.videostream.VideoStream` writes each frame into a free slot, the thread-worker gets only the
+    slot index and reads the frame from the same memory. The slot is given back after the result of the frame arrived.
+    Pickling a ring only pickles its name, the thread-workers attach to the shared memory once per process.
+
+    :param shape: the shape of one frame
+    :param dtype: the data type of the frames, defaults to uint8
+    :param slots: the amount of frame slots, which is also the maximum of frames in work at the same time
+    :param name: the name of an existing ring to attach to, a new one is created if None
+
+    :ivar frames: the array of all slots, with the shape (slots, \\*shape)
+    :ivar owner: flag if this ring created the shared memory (and has to remove it in the end)
+    :ivar free: the queue of free slot indices, only used by the owner
+    """
+
+    def __init__(self, shape: tuple, dtype=np.uint8, slots: int = 8, name: str = None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = int(slots)
+        self.owner = name is None
+        size = self.slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.name = self.shm.name
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.free = queue.Queue()
+        if self.owner:
+            for slot in range(self.slots):
+                self.free.put(slot)
+        _rings[self.name] = self
+
+    def __reduce__(self):
+        return FrameRing.attached, (self.name, self.shape, self.dtype.str, self.slots)
+
+    @staticmethod
+    def prepare():
+        """
+        Starts the resource tracker of the shared memory. Has to be called before the thread-workers are forked,
+        if the ring is created afterwards: otherwise each thread-worker starts its own tracker when attaching, which
+        removes the shared memory when the thread-worker ends.
+        """
+        resource_tracker.ensure_running()
+
+    @staticmethod
+    def attached(name: str, shape: tuple, dtype: str, slots: int) -> FrameRing:
+        """
+        Gives the ring with this name, attaches to its shared memory only if this process does not know it yet
+
+        :rtype: FrameRing
+        """
+        ring = _rings.get(name)
+        if ring is None:
+            ring = FrameRing(shape, dtype, slots, name)
+        return ring
+
+    def acquire(self, timeout: float = None) -> int:
+        """
+        Takes a free slot. Waits, if all slots are in work.
+
+        :param timeout: the maximal time in seconds to wait, forever if None
+        :return: the index of the slot
+        :raises queue.Empty: if no slot got free in time
+        """
+        return self.free.get(timeout=timeout)
+
+    def release(self, slot: int):
+        """
+        Gives a slot back, after the frame in it is not used anymore
+
+        :param slot: the index of the slot
+        """
+        self.free.put(slot)
+
+    def frame(self, slot: int):
+        """
+        :param slot: the index of the slot
+        :return: the frame array in the slot, not a copy
+        """
+        return self.frames[slot]
+
+    def close(self):
+        """
+        Closes the shared memory, and removes it if this ring created it
+        """
+        _rings.pop(self.name, None)
+        # the array has to be gone before the memory can be closed
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # someone still holds a frame of the ring, the memory is freed with the process then
+            pass
+        if self.owner:
+            self.shm.unlink()
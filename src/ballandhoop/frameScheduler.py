@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+
+
+class FrameScheduler:
+    """
+    Hands the frames to the thread-worker pool, but only a limited amount at the same time. If all thread-workers are
+    busy, the newest frame waits and replaces any older waiting frame, which is dropped. So the next free
+    thread-worker always gets the newest frame and the latency stays bounded, even if the thread-workers can not keep
+    up with the camera (e.g. in debug mode or with a high resolution).
+
+    :param pool: the thread-worker pool
+    :type pool: multiprocessing.Pool
+    :param processes: the amount of thread-workers in the pool
+    :param max_in_flight: the maximal amount of frames per thread-worker which are sent to the pool at the same time,
+        0 sends every frame at once without a limit
+    :param callback: called with the result of each frame
+    :param error_callback: called with the frame number and the error of each failed frame
+    :param on_drop: called with the frame number of each dropped frame
+    :param on_dispatch: called with the frame number of each frame, right before it is sent to the pool
+
+    :ivar in_flight: the amount of frames in the pool right now
+    :ivar pending: the waiting frame, if any
+    :ivar dispatched: the amount of frames sent to the pool
+    :ivar dropped: the amount of frames which were replaced by a newer one before they were sent
+    """
+
+    def __init__(self, pool, processes: int, max_in_flight: int = 2, callback=None, error_callback=None,
+                 on_drop=None, on_dispatch=None, **kwargs):
+        self.pool = pool
+        self.limit = processes * max_in_flight
+        self.callback = callback
+        self.error_callback = error_callback
+        self.on_drop = on_drop
+        self.on_dispatch = on_dispatch
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.pending = None
+        self.dispatched = 0
+        self.dropped = 0
+
+    def submit(self, frame_number: int, func, args: tuple, release=None):
+        """
+        Sends the frame to the pool, or lets it wait, if there are too many in flight already
+
+        :param frame_number: the number of the frame
+        :param func: the function the thread-worker calls
+        :param args: the arguments of the function
+        :param release: called without arguments as soon as the frame is not needed anymore (done, failed or dropped),
+            e.g. to give its slot of a :py:class:`~.frameRing.FrameRing` back
+        """
+        task = (frame_number, func, args, release)
+        with self.lock:
+            if self.limit and self.in_flight >= self.limit:
+                task, self.pending = self.pending, task
+                if task is not None:
+                    self.dropped += 1
+                dispatch = False
+            else:
+                self.in_flight += 1
+                self.dispatched += 1
+                dispatch = True
+        if dispatch:
+            self.dispatch(task)
+        elif task is not None:
+            self.drop(task)
+
+    def dispatch(self, task: tuple):
+        """
+        Sends a task to the pool, the callbacks release the frame and send the waiting frame next
+
+        :param task: the frame number, function, arguments and release of the frame
+        """
+        frame_number, func, args, release = task
+
+        def callback(result):
+            self.done(release)
+            if self.callback is not None:
+                self.callback(result)
+
+        def error_callback(e):
+            self.done(release)
+            if self.error_callback is not None:
+                self.error_callback(frame_number, e)
+
+        if self.on_dispatch is not None:
+            self.on_dispatch(frame_number)
+        self.pool.apply_async(func, args=args, callback=callback, error_callback=error_callback)
+
+    def done(self, release=None):
+        """
+        Called for each frame which came back from the pool, sends the waiting frame, if any
+
+        :param release: the release of the finished frame
+        """
+        if release is not None:
+            release()
+        with self.lock:
+            task, self.pending = self.pending, None
+            if task is None:
+                self.in_flight -= 1
+            else:
+                self.dispatched += 1
+        if task is not None:
+            self.dispatch(task)
+
+    def drop(self, task: tuple):
+        """
+        Throws a waiting frame away
+
+        :param task: the frame number, function, arguments and release of the frame
+        """
+        frame_number, _, _, release = task
+        if release is not None:
+            release()
+        if self.on_drop is not None:
+            self.on_drop(frame_number)
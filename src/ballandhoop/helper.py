@@ -1,6 +1,7 @@
 import os
 import shutil
 import cv2
+import numpy as np
 
 
 def get_bgr_picture(faker_path: str = None, wb_gains=None):
@@ -54,3 +55,36 @@ def reset_content_of_dir(dir_name: str):
     if os.path.exists(dir_name):
         shutil.rmtree(dir_name)
     os.makedirs(dir_name)
+
+
+def yuv_planes(frame_yuv):
+    """
+    Splits a YUV420 (I420) frame, as delivered by :py:class:`~.piYUVArray.PiYUVArray` or
+    `cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)`, into its planes without copying them
+
+    :param frame_yuv: the frame array with the shape (height * 3 / 2, width)
+    :return: the luma plane in full resolution and the two chroma planes in a quarter of the resolution
+    :rtype: (numpy.array, numpy.array, numpy.array)
+    """
+    height = frame_yuv.shape[0] * 2 // 3
+    width = frame_yuv.shape[1]
+    y = frame_yuv[:height]
+    u = frame_yuv[height:height + height // 4].reshape(height // 2, width // 2)
+    v = frame_yuv[height + height // 4:].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+def yuv_quarter(frame_yuv, luma: bool = True):
+    """
+    Merges the planes of a YUV420 frame to a 3 channel (Y, U, V) array in the resolution of the chroma planes
+
+    :param frame_yuv: the frame array with the shape (height * 3 / 2, width)
+    :param luma: if False, the luma plane is not downsampled and left black
+    :return: the (height / 2, width / 2, 3) array
+    """
+    y, u, v = yuv_planes(frame_yuv)
+    if luma:
+        y = cv2.resize(y, (u.shape[1], u.shape[0]), interpolation=cv2.INTER_AREA)
+    else:
+        y = np.zeros_like(u)
+    return cv2.merge([y, u, v])
@@ -1,11 +1,14 @@
 from __future__ import annotations
+import functools
 import math
 import imutils
 import numpy as np
 import cv2
 import circle_fit as cf
 
-from src.ballandhoop import helper, Ball, Image
+from src.ballandhoop import Image
+from src.ballandhoop.colorTable import ColorTable
+from src.ballandhoop.polarUnwrap import PolarUnwrap
 
 
 class Hoop:
@@ -19,11 +22,12 @@ class Hoop:
     :param radius_dots: a list of the radius' of the hoop markers for finding the hoop
     :param angle_offset: a custom offset of angle, which will be added to each result of :py:meth:`.angle_in_hoop()`
     :param fov: a 2-tuple of angles which will be used as starting and ending angles to cut off the picture mask outside this circle sector
+    :param hsv: the colors of the hoop markers, a dict with `lower` and `upper` (H,S,V) values, used for the :py:class:`~.colorTable.ColorTable`
     :param kwargs: just a placeholder so if additional keys are given in config file, there will be no errors, because some config file attributes will be used in the methods
     """
 
     def __init__(self, center: list, radius: int, center_dots: list, radius_dots: list, angle_offset=0, fov=(90, 270),
-                 **kwargs):
+                 hsv: dict = None, **kwargs):
         self.center = center,
         # i do not know why i need this line, input is ok, self. ist not
         self.center = list(self.center[0])
@@ -33,6 +37,30 @@ class Hoop:
         self.radius_dots = list(radius_dots)
         self.angle_offset = int(angle_offset)
         self.fov = fov
+        self.hsv = hsv
+        # the detector engines of find_ball() by their config and frame shape, see engine()
+        self.engines = {}
+
+    def __getstate__(self):
+        # the engines are not pickled, they are built again on demand
+        state = dict(self.__dict__)
+        state['engines'] = {}
+        return state
+
+    def sector_mask(self, shape, scale: int = 1):
+        """
+        Gives the mask of the hoop :py:attr:`fov` sector, cropped to its bounding rectangle.
+        The mask is only drawn once per center, radius, fov and resolution and is cached per process afterwards,
+        so a changed hoop geometry results in a new mask automatically.
+        The returned mask is shared between calls and read-only.
+
+        :param shape: the shape of the frame the mask is used for, only height and width are relevant
+        :param scale: the factor the frame is downsampled by, compared to the hoop coordinates, defaults to 1
+        :return: the cropped sector mask and its bounding rectangle (x, y, w, h) inside the frame
+        :rtype: (numpy.array, tuple)
+        """
+        center = (self.center[0] // scale, self.center[1] // scale)
+        return _sector_mask(center, self.radius // scale, tuple(self.fov), tuple(shape[:2]))
 
     @staticmethod
     def create_from_image(hsv, image: Image, morph_iterations=0, debug_output_path=None, min_dots_radius=2, **kwargs):
@@ -91,6 +119,46 @@ class Hoop:
         hoop = Hoop([int(xc), int(yc)], int(radius_hoop), dots_center, dots_radius)
         return hoop
 
+    def find_dots_in_windows(self, frame_hsv, window=10, morph_iterations=0, min_dots_radius=2):
+        """
+        Does the marker search of :py:meth:`create_from_image()` again, but only in small windows around the known
+        :py:attr:`center_dots`, so it is cheap enough to be repeated while the application is running.
+        In each window the biggest marker is used.
+
+        :param frame_hsv: the frame array in HSV color space
+        :param window: the amount of pixels the markers may have moved, added to each side of the marker
+        :param morph_iterations: amount of times the mask will be eroded and dilated, like in :py:meth:`create_from_image()`
+        :param min_dots_radius: the minimal radius of the markers
+        :return: one entry per known marker, the found center (float) and radius, or None if it was not found
+        :rtype: list[((float, float), float) | None]
+        """
+        lower_hsv = np.array(self.hsv['lower'])
+        upper_hsv = np.array(self.hsv['upper'])
+        height, width = frame_hsv.shape[:2]
+        found = []
+        for (cx, cy), r in zip(self.center_dots, self.radius_dots):
+            half = int(r) + int(window)
+            x0, y0 = max(int(cx) - half, 0), max(int(cy) - half, 0)
+            x1, y1 = min(int(cx) + half + 1, width), min(int(cy) + half + 1, height)
+            if x0 >= x1 or y0 >= y1:
+                found.append(None)
+                continue
+            mask = cv2.inRange(frame_hsv[y0:y1, x0:x1], lower_hsv, upper_hsv)
+            if morph_iterations > 0:
+                mask = cv2.erode(mask, None, iterations=morph_iterations)
+                mask = cv2.dilate(mask, None, iterations=morph_iterations)
+            cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+            cnts = imutils.grab_contours(cnts)
+            dot = None
+            for c in sorted(cnts, key=cv2.contourArea, reverse=True):
+                (_, radius) = cv2.minEnclosingCircle(c)
+                m = cv2.moments(c)
+                if radius >= min_dots_radius and m["m00"] > 0:
+                    dot = ((m["m10"] / m["m00"], m["m01"] / m["m00"]), radius)
+                    break
+            found.append(dot)
+        return found
+
     def angle_in_hoop(self, p: tuple):
         """
         Calculates the angle between a given point (e.g. the ball center) inside the hoop.
@@ -100,10 +168,10 @@ class Hoop:
         :type p: tuple
         :return: The angle between (p - :py:attr:`self.center`)  and (0, :py:attr:`self.radius`)
         """
-
-        v1 = np.array((0, self.radius))
-        v2 = np.array(p) - np.array(self.center)
-        return self.angle_of_vectors(v1, v2) + self.angle_offset
+        # the same as angle_of_vectors() with v1 = (0, radius), but without allocating arrays for each call
+        dx = p[0] - self.center[0]
+        dy = p[1] - self.center[1]
+        return math.atan2(-self.radius * dx, self.radius * dy) / math.pi * 180 + self.angle_offset
 
     @staticmethod
     def angle_of_vectors(v1, v2):
@@ -116,66 +184,115 @@ class Hoop:
         y = np.dot(v1, v2)
         return math.atan2(x, y) / math.pi * 180
 
-    def find_ball_async(self, frame_number, frame, ball_config, dir_path=None):
+    def angle_map(self, shape, scale: int = 1):
+        """
+        Gives the direction of each pixel of the hoop :py:attr:`fov` sector, seen from the hoop center, as unit
+        vector (cos, sin) of its angle (measured like :py:meth:`angle_in_hoop()`, without the :py:attr:`angle_offset`)
+        and its distance to the center. The maps are cropped like :py:meth:`sector_mask()`, cached per process and
+        read-only.
+
+        :param shape: the shape of the frame the maps are used for, only height and width are relevant
+        :param scale: the factor the frame is downsampled by, compared to the hoop coordinates, defaults to 1
+        :return: the (h, w, 3) float32 maps of cos, sin and distance and the rectangle (x, y, w, h) inside the frame
+        :rtype: (numpy.array, tuple)
+        """
+        return _angle_map(tuple(self.center), self.radius, tuple(self.fov), tuple(shape[:2]), scale)
+
+    def find_ball_async(self, frame_number, frame, ball_config, dir_path=None, search_window=None):
         """
         A wrapper function for the async call from the :py:class:`Application` for :py:meth:`find_ball()`.
 
         :param frame_number: the number of the frame, not used for calculation but important for the :py:meth:`application callback <.application.Application.ball_found_async_callback()>`
-        :param frame: the frame array in hsv color space
+        :param frame: the frame array in hsv color space, or bgr if the color table is used
         :param ball_config: the ball config, see :py:meth:`find_ball()` for more info
         :param dir_path: the directory where debugging pictures will be saved
+        :param search_window: the predicted search window of the :py:class:`~.tracker.BallTracker`, if any
         :return: A tuple of the given frame number and the found ball, if any
         :rtype: (int, Ball|None)
         """
-        ball = self.find_ball(frame, **ball_config, dir_path=dir_path)
+        ball = self.find_ball(frame, **ball_config, dir_path=dir_path, search_window=search_window,
+                              frame_number=frame_number)
         return frame_number, ball
 
-    def find_ball(self, frame, hsv, morph_iterations=1, min_radius=5, max_radius=20, dir_path=None, **kwargs):
+    def find_ball(self, frame, hsv, morph_iterations=1, min_radius=5, max_radius=20, dir_path=None, *,
+                  search_window=None, frame_number=None, **kwargs):
         """
-        Tries to find the ball in the given picture. Therefore, the image is filtered with the given HSV colors to a mask.
-        This mask is morphed, depending on the given iterations. There will be a dilatation and an erode afterwards (closure),
-        to close holes in the found ball mask which will be there because of the physical hoop.
-        All found mask points which are outside the given hoop :py:attr:`Field of View<fov>` are removed.
-        It will then loop through the biggest connected areas in the mask (the biggest first). If their radius is inside min_radius and
-        max_radius the found ball will be returned or none if none of the connected areas are fitting the limits.
+        Tries to find the ball in the given frame with the detector engine which is chosen by the `detector` key of
+        the ball config, see :py:class:`~.detectors.Detector` for the search and the config keys.
+        The engine is only built once per config and frame shape, see :py:meth:`engine()`.
 
-        :param frame: the array of the frame in HSV color space
+        :param frame: the array of the frame in HSV color space, BGR color space if `color_table` is set or
+            YUV420 if `yuv` is set
         :param hsv: a dictionary with `upper` and `lower` and (H,S,V) values, which the frame will be filtered to
         :param morph_iterations: the amount of iterations to morph, defaults to 1
         :param min_radius: the minimal radius a ball is allowed to have, defaults to 5
         :param max_radius: the maximal radius a ball is allowed to have, defaults to 20
         :param dir_path: the directory where debugging pictures will be saved, defaults to None
-        :param kwargs: just a catch-all for additional parameters from the config file, will be ignored
+        :param search_window: a rectangle (x, y, w, h) where the ball is expected, see :py:class:`~.tracker.BallTracker`
+        :param frame_number: the number of the frame, needed by the background model to handle skipped frames
+        :param kwargs: the other keys of the ball config, additional keys from the config file will be ignored
         :return: the found ball, if any
         :rtype: Ball | None
         """
-        Image(image_hsv=frame).save(dir_path, 'raw')
-        mask_ball = cv2.inRange(frame, np.array(hsv['lower']), np.array(hsv['upper']))
-        Image(image_bw=mask_ball).save(dir_path, 'ball-mask')
-        if morph_iterations > 0:
-            mask_ball = cv2.dilate(mask_ball, None, iterations=morph_iterations)
-            Image(image_bw=mask_ball).save(dir_path, 'ball-mask-dil')
-            mask_ball = cv2.erode(mask_ball, None, iterations=morph_iterations)
-            Image(image_bw=mask_ball).save(dir_path, 'ball-mask-dil-erode')
+        ball_config = dict(kwargs, hsv=hsv, morph_iterations=morph_iterations, min_radius=min_radius,
+                           max_radius=max_radius)
+        return self.engine(ball_config, frame.shape).detect(frame, frame_number, dir_path, search_window)
 
-        mask_hoop = np.zeros_like(mask_ball)
-        mask_hoop = cv2.ellipse(mask_hoop, self.center, (self.radius, self.radius), 0, self.fov[0] - 90,
-                                self.fov[1] - 90, (255, 255, 255), -1)
-        Image(image_bw=mask_hoop).save(dir_path, 'segment-mask')
-        mask = cv2.bitwise_and(mask_hoop, mask_ball)
-        Image(image_bw=mask).save(dir_path, 'final-mask')
+    def engine(self, ball_config: dict, shape: tuple):
+        """
+        Gives the detector engine of :py:func:`~.detectors.create_detector()` for the ball config and frame shape.
+        It is built once and kept in :py:attr:`engines`, so its masks, tables and maps are only prepared once.
 
-        cnts = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL,
-                                cv2.CHAIN_APPROX_SIMPLE)
+        :param ball_config: the ball config
+        :param shape: the shape of the frames
+        :rtype: ~.detectors.Detector
+        """
+        key = (repr(sorted(ball_config.items())), tuple(shape))
+        if key not in self.engines:
+            # the engines are built on top of the hoop, so they can only be imported here
+            from src.ballandhoop.detectors import create_detector
+            if len(self.engines) >= 8:
+                # only a few configs are used at once, so the old ones are not needed anymore
+                self.engines.clear()
+            self.engines[key] = create_detector(self, ball_config, shape)
+        return self.engines[key]
+
+    def polar_unwrap(self, shape, scale: int, polar_band, polar_step=0.5) -> PolarUnwrap:
+        """
+        Gives the unwrapping of the ring for the :py:class:`~.detectors.PolarDetector`, cached per process
+
+        :param shape: the shape of the (maybe downsampled) frame
+        :param scale: the factor the frame is downsampled by, compared to the hoop coordinates
+        :param polar_band: the width of the ring in pixels
+        :param polar_step: the angle of one column of the strip in degree
+        :rtype: PolarUnwrap
+        """
+        center = (self.center[0] / scale, self.center[1] / scale)
+        return PolarUnwrap.cached(center, self.radius / scale, tuple(self.fov), tuple(shape[:2]),
+                                  int(polar_band / scale), float(polar_step))
+
+    @staticmethod
+    def blob_from_contours(mask, rect, min_radius, max_radius):
+        """
+        Searches the biggest contour in the mask, which minimum enclosing circle fits the radius limits.
+
+        :param mask: the final mask of the rectangle
+        :param rect: the rectangle (x, y, w, h) of the mask inside the frame
+        :param min_radius: the minimal radius a ball is allowed to have
+        :param max_radius: the maximal radius a ball is allowed to have
+        :return: the centroid in frame coordinates, the radius and the area of the blob, or None
+        :rtype: ((float, float), float, float) | None
+        """
+        # the offset shifts the contours from the region of interest back to frame coordinates
+        cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=rect[:2])
         # this function only wraps the different opencv signatures, it does nothing else
         cnts = list(imutils.grab_contours(cnts))
         # sort contours in the mask by area, then try if the
         #  minimum enclosing circle is fitting in the ball radius range
         cnts = sorted(cnts, key=cv2.contourArea, reverse=True)
 
-        ball = None
         for c in cnts:
-            ((x, y), radius) = cv2.minEnclosingCircle(c)
+            (_, radius) = cv2.minEnclosingCircle(c)
             if radius < min_radius or radius > max_radius:
                 # skip this entry if to big or too small
                 continue
@@ -184,18 +301,202 @@ class Hoop:
             if float(m['m00']) == 0.0:
                 # div 0
                 continue
-            center_ball = (int(m["m10"] / m["m00"]), int(m["m01"] / m["m00"]))
-            ball = Ball(self, center_ball, int(radius))
             # keep the first fitting ball and do not loop further
-            break
-
-        # this if is technically not necessary but saves a bit performance
-        if dir_path is not None:
-            # save a result picture if debug dir path is set
-            Image(image_hsv=frame) \
-                .plot_hoop(self) \
-                .plot_ball(ball) \
-                .plot_angle(ball) \
-                .save(dir_path, 'result')
-        # returns None if there was no valid ball contour in the list, the first found ball otherwise
-        return ball
+            return (m["m10"] / m["m00"], m["m01"] / m["m00"]), radius, m["m00"]
+        return None
+
+    @staticmethod
+    def blob_from_components(mask, rect, min_radius, max_radius):
+        """
+        Same as :py:meth:`blob_from_contours()`, but with the statistics of all connected components, which are
+        calculated in a single pass. The radius of a component is half of the longer side of its bounding box
+        and the filtering by the radius limits is done for all components at once.
+
+        :param mask: the final mask of the rectangle
+        :param rect: the rectangle (x, y, w, h) of the mask inside the frame
+        :param min_radius: the minimal radius a ball is allowed to have
+        :param max_radius: the maximal radius a ball is allowed to have
+        :return: the centroid in frame coordinates, the radius and the area of the blob, or None
+        :rtype: ((float, float), float, float) | None
+        """
+        n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # label 0 is the background
+        radii = np.maximum(stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]) / 2
+        areas = np.where((radii >= min_radius) & (radii <= max_radius), stats[1:, cv2.CC_STAT_AREA], 0)
+        if n < 2 or areas.max() == 0:
+            return None
+        best = int(np.argmax(areas))
+        return (centroids[best + 1, 0] + rect[0], centroids[best + 1, 1] + rect[1]), radii[best], areas[best]
+
+    def find_balls(self, frames, hsv, morph_iterations=1, min_radius=5, max_radius=20, color_table=False,
+                   color_table_bits=5, *, search_windows=None, **kwargs):
+        """
+        Does the same as :py:meth:`find_ball()` for a whole batch of frames at once, e.g. for reprocessing recorded
+        runs. The regions of interest of all frames are stacked below each other, separated by a few rows, so the
+        thresholding, the morphing, the sector masking and the contour search are one OpenCV call each for the
+        whole batch. The results are identical to calling :py:meth:`find_ball()` for each frame.
+        Only the contours detector on HSV or BGR frames without the pyramid search is stacked, with any other ball
+        config or with search windows the frames go through one engine of :py:meth:`engine()` after each other.
+        The :py:class:`~.tracker.BallTracker` is not run, its windows can be given as search windows.
+
+        :param frames: the stacked frames with the shape (N, height, width, 3), in HSV color space or BGR if
+            `color_table` is set, or (N, height, width) for YUV420 frames
+        :param hsv: a dictionary with `upper` and `lower` and (H,S,V) values, which the frames will be filtered to
+        :param morph_iterations: the amount of iterations to morph, defaults to 1
+        :param min_radius: the minimal radius a ball is allowed to have, defaults to 5
+        :param max_radius: the maximal radius a ball is allowed to have, defaults to 20
+        :param color_table: flag if the ball mask should be looked up in the color table, defaults to False
+        :param color_table_bits: the bits per channel of the color table, defaults to 5
+        :param search_windows: a search window (x, y, w, h) or None for each frame, defaults to None
+        :param kwargs: the other keys of the ball config, additional keys from the config file will be ignored
+        :return: the centers (N, 2), the radii (N) and the angles (N) of the balls. If there is no ball in a frame
+            its center is (-1, -1), its radius 0 and its angle NaN
+        :rtype: (numpy.array, numpy.array, numpy.array)
+        """
+        n, height, width = frames.shape[:3]
+        centers = np.full((n, 2), -1, dtype=int)
+        radii = np.zeros(n, dtype=int)
+        angles = np.full(n, np.nan)
+        if search_windows is not None or (kwargs.get('detector') or 'contours') != 'contours' or kwargs.get('yuv') \
+                or kwargs.get('pyramid_levels'):
+            ball_config = dict(kwargs, hsv=hsv, morph_iterations=morph_iterations, min_radius=min_radius,
+                               max_radius=max_radius, color_table=color_table, color_table_bits=color_table_bits)
+            detector = self.engine(ball_config, frames.shape[1:])
+            for idx in range(n):
+                ball = detector.detect(frames[idx], idx + 1, None,
+                                       None if search_windows is None else search_windows[idx])
+                if ball is not None:
+                    centers[idx] = ball.center
+                    radii[idx] = ball.radius
+                    angles[idx] = ball.angle()
+            return centers, radii, angles
+        mask_hoop, (x, y, w, h) = self.sector_mask(frames.shape[1:])
+        if n == 0 or w == 0 or h == 0:
+            return centers, radii, angles
+        pad = 2 * max(morph_iterations, 0)
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1, y1 = min(x + w + pad, width), min(y + h + pad, height)
+        # the separating rows keep the morphing of one frame away from the next one
+        sep = max(morph_iterations, 1)
+        stride = y1 - y0 + sep
+        stack = np.zeros((n, stride, x1 - x0, frames.shape[3]), dtype=frames.dtype)
+        stack[:, :y1 - y0] = frames[:, y0:y1, x0:x1]
+        stack = stack.reshape(n * stride, x1 - x0, frames.shape[3])
+        if color_table:
+            mask_ball = ColorTable.cached(hsv, self.hsv, color_table_bits).mask(stack, ColorTable.BALL)
+        else:
+            mask_ball = cv2.inRange(stack, np.array(hsv['lower']), np.array(hsv['upper']))
+        rows = mask_ball.reshape(n, stride, x1 - x0)
+        if morph_iterations > 0:
+            # outside of a frame nothing is dilated into it and nothing is eroded out of it, like at the frame border
+            rows[:, y1 - y0:] = 0
+            mask_ball = cv2.dilate(mask_ball, None, iterations=morph_iterations)
+            rows = mask_ball.reshape(n, stride, x1 - x0)
+            rows[:, y1 - y0:] = 255
+            mask_ball = cv2.erode(mask_ball, None, iterations=morph_iterations)
+            rows = mask_ball.reshape(n, stride, x1 - x0)
+        # the sector mask is the same for each frame, everything else (padding and separator) is removed
+        mask = np.zeros_like(rows)
+        mask[:, y - y0:y - y0 + h, x - x0:x - x0 + w] = mask_hoop
+        mask = cv2.bitwise_and(mask, rows).reshape(n * stride, x1 - x0)
+
+        cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        cnts = list(imutils.grab_contours(cnts))
+        # the biggest contours first, like in find_ball, the stable sort keeps the order inside each frame
+        cnts = sorted(cnts, key=cv2.contourArea, reverse=True)
+        for c in cnts:
+            # the frame of the contour is given by its position in the stack
+            idx = (c[0, 0, 1] - y0) // stride
+            if radii[idx] > 0:
+                continue
+            c = c - np.array([0, idx * stride], dtype=c.dtype)
+            ((_, _), radius) = cv2.minEnclosingCircle(c)
+            if radius < min_radius or radius > max_radius:
+                continue
+            m = cv2.moments(c)
+            if float(m['m00']) == 0.0:
+                continue
+            centers[idx] = (int(m["m10"] / m["m00"]), int(m["m01"] / m["m00"]))
+            radii[idx] = int(radius)
+        # same calculation as angle_in_hoop, but without the arrays per ball. math.atan2 is used on purpose,
+        # the vectorised numpy version can differ in the last digit
+        for idx in np.flatnonzero(radii):
+            dx, dy = int(centers[idx, 0]) - self.center[0], int(centers[idx, 1]) - self.center[1]
+            angles[idx] = math.atan2(-self.radius * dx, self.radius * dy) / math.pi * 180 + self.angle_offset
+        return centers, radii, angles
+
+
+def circle_fill(area: float, radius: float) -> float:
+    """
+    The share of a circle which is covered by the given area, used as confidence of a found ball
+
+    :param area: the area of the blob
+    :param radius: the radius of the circle around the blob
+    :return: the share between 0 and 1
+    """
+    if radius <= 0:
+        return 0.0
+    return float(min(area / (math.pi * radius * radius), 1.0))
+
+
+def intersect_rects(a: tuple, b: tuple):
+    """
+    Calculates the intersection of two rectangles
+
+    :param a: the first rectangle (x, y, w, h)
+    :param b: the second rectangle (x, y, w, h)
+    :return: the intersection (x, y, w, h) or None if they do not overlap
+    :rtype: tuple | None
+    """
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def rect_contains_circle(rect: tuple, center: tuple, radius: int, bounds: tuple) -> bool:
+    """
+    Checks if a circle lies inside a rectangle. Sides of the rectangle which are also sides of the bounds do not count,
+    because there is nothing to find outside of them anyway.
+
+    :param rect: the rectangle (x, y, w, h)
+    :param center: the center of the circle
+    :param radius: the radius of the circle
+    :param bounds: the outer rectangle (x, y, w, h) the rectangle is part of
+    :rtype: bool
+    """
+    x, y, w, h = rect
+    return (center[0] - radius > x or x == bounds[0]) \
+        and (center[1] - radius > y or y == bounds[1]) \
+        and (center[0] + radius < x + w - 1 or x + w == bounds[0] + bounds[2]) \
+        and (center[1] + radius < y + h - 1 or y + h == bounds[1] + bounds[3])
+
+
+@functools.lru_cache(maxsize=8)
+def _sector_mask(center: tuple, radius: int, fov: tuple, size: tuple):
+    """
+    Draws the hoop sector mask once per parameter set, see :py:meth:`Hoop.sector_mask()`
+    """
+    mask = np.zeros(size, dtype=np.uint8)
+    mask = cv2.ellipse(mask, center, (radius, radius), 0, fov[0] - 90, fov[1] - 90, 255, -1)
+    x, y, w, h = cv2.boundingRect(mask)
+    mask = mask[y:y + h, x:x + w].copy()
+    # the mask is shared between all calls, so make sure nobody writes into it
+    mask.setflags(write=False)
+    return mask, (x, y, w, h)
+
+
+@functools.lru_cache(maxsize=8)
+def _angle_map(center: tuple, radius: int, fov: tuple, size: tuple, scale: int):
+    """
+    Calculates the direction and distance maps once per parameter set, see :py:meth:`Hoop.angle_map()`
+    """
+    _, (x, y, w, h) = _sector_mask((center[0] // scale, center[1] // scale), radius // scale, fov, size)
+    # the middle of each (maybe downsampled) pixel in hoop coordinates
+    dx = (np.arange(x, x + w) * scale + (scale - 1) / 2 - center[0])[np.newaxis, :]
+    dy = (np.arange(y, y + h) * scale + (scale - 1) / 2 - center[1])[:, np.newaxis]
+    angle = np.arctan2(-dx, dy)
+    maps = np.dstack(np.broadcast_arrays(np.cos(angle), np.sin(angle), np.hypot(dx, dy))).astype(np.float32)
+    maps.setflags(write=False)
+    return maps, (x, y, w, h)
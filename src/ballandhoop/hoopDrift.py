@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import circle_fit as cf
+import cv2
+import numpy as np
+
+from src.ballandhoop.hoop import Hoop
+
+
+class HoopDriftTracker:
+    """
+    Follows a slowly moving hoop (e.g. after the camera was bumped) while the application is running.
+    Every `drift_interval` frames the main loop offers a frame with :py:meth:`offer()`, which only hands over the
+    reference. A low priority background thread searches the markers in small windows around their known positions,
+    see :py:meth:`.Hoop.find_dots_in_windows()`, fits the circle again and moves the hoop geometry a bit towards it.
+    The hoop is never changed in place: a new :py:class:`.Hoop` is built and swapped in, so the main loop hands either
+    the old or the new one to the thread-workers, which are rebuilding their cached sector masks by themselves.
+
+    :param hoop: the hoop found at startup, its `hsv` are the marker colors
+    :param color_space: the color space of the offered frames, 'hsv', 'bgr' or 'yuv' (I420)
+    :param on_update: called with the new hoop from the background thread, at most every `drift_persist_interval` seconds
+    :param drift_interval: every this many frames a frame is sampled, defaults to 300
+    :param drift_window: the amount of pixels a marker may have moved between two samples, defaults to 10
+    :param drift_alpha: the weight of a new measurement in the smoothing, defaults to 0.2
+    :param drift_persist_interval: the minimal amount of seconds between two calls of `on_update`, defaults to 60
+    :param morph_iterations: the morph iterations of the marker search, like in :py:meth:`.Hoop.create_from_image()`
+    :param min_dots_radius: the minimal radius of the markers
+    :param kwargs: a catch-all parameter, so the hoop config can be used as parameter
+
+    :ivar hoop: the current hoop, replaced as a whole on each update
+    :ivar updates: the amount of accepted measurements
+    :ivar rejected: the amount of samples with too few markers or a too big jump
+    """
+
+    def __init__(self, hoop: Hoop, color_space: str = 'hsv', on_update=None, drift_interval: int = 300,
+                 drift_window: int = 10, drift_alpha: float = 0.2, drift_persist_interval: float = 60,
+                 morph_iterations: int = 0, min_dots_radius: int = 2, **kwargs):
+        self.hoop = hoop
+        self.color_space = color_space
+        self.on_update = on_update
+        self.interval = int(drift_interval)
+        self.window = int(drift_window)
+        self.alpha = float(drift_alpha)
+        self.persist_interval = float(drift_persist_interval)
+        self.morph_iterations = int(morph_iterations)
+        self.min_dots_radius = min_dots_radius
+        self.updates = 0
+        self.rejected = 0
+        # the smoothed geometry is kept in float, the hoop only gets the rounded values
+        self.dots = np.array(hoop.center_dots, dtype=float)
+        self.center = np.array(hoop.center, dtype=float)
+        self.radius = float(hoop.radius)
+        self.last_persist = time.time()
+        self.frame = None
+        self.event = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='hoop-drift', daemon=True)
+
+    def start(self):
+        """
+        Starts the background thread
+        """
+        self.thread.start()
+
+    def close(self, timeout: float = 2):
+        """
+        Stops the background thread after its current search
+
+        :param timeout: the maximal amount of seconds to wait for the current search, the thread is a daemon anyway
+        """
+        self.running = False
+        self.event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def offer(self, frame_number: int, frame, copy: bool = False):
+        """
+        Called by the main loop for each frame. Only every `drift_interval` frames and only if the last sample was
+        taken by the background thread already, the reference of the frame is stored, so this never waits and only
+        copies if asked to.
+
+        :param frame_number: the number of the frame
+        :param frame: the frame array in the color space given to the constructor
+        :param copy: flag if the frame has to be copied, because its memory is reused (e.g. a ring slot)
+        """
+        if frame_number % self.interval == 0 and self.frame is None:
+            self.frame = frame.copy() if copy else frame
+            self.event.set()
+
+    def run(self):
+        """
+        The loop of the background thread, waits for offered frames
+        """
+        try:
+            # linux allows a niceness per thread, the thread-workers and the main loop are preferred
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while self.running:
+            self.event.wait()
+            # cleared before the search, so a close() during the search is not lost
+            self.event.clear()
+            if not self.running:
+                return
+            frame, self.frame = self.frame, None
+            if frame is not None:
+                self.measure(frame)
+
+    def to_hsv(self, frame):
+        """
+        Converts an offered frame to HSV for the marker search
+
+        :param frame: the frame array in the color space given to the constructor
+        :return: the frame in HSV color space
+        """
+        if self.color_space == 'yuv':
+            frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        elif self.color_space != 'bgr':
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+
+    def measure(self, frame):
+        """
+        Searches the markers in the frame and updates the hoop, if enough markers were found
+
+        :param frame: the frame array in the color space given to the constructor
+        :return: flag if the hoop was updated
+        :rtype: bool
+        """
+        found = self.hoop.find_dots_in_windows(self.to_hsv(frame), self.window, self.morph_iterations,
+                                               self.min_dots_radius)
+        points = [dot[0] for dot in found if dot is not None]
+        if len(points) < 3:
+            self.rejected += 1
+            return False
+        xc, yc, radius, _ = cf.least_squares_circle(points)
+        if np.hypot(xc - self.center[0], yc - self.center[1]) > self.window or abs(radius - self.radius) > self.window:
+            # the markers can not move further than the window, so some other colored spot was found
+            self.rejected += 1
+            return False
+        self.center += self.alpha * (np.array((xc, yc)) - self.center)
+        self.radius += self.alpha * (radius - self.radius)
+        for i, dot in enumerate(found):
+            if dot is not None:
+                self.dots[i] += self.alpha * (np.array(dot[0]) - self.dots[i])
+        old = self.hoop
+        self.hoop = Hoop([int(round(c)) for c in self.center], int(round(self.radius)),
+                         [[int(round(c)) for c in dot] for dot in self.dots], old.radius_dots,
+                         angle_offset=old.angle_offset, fov=old.fov, hsv=old.hsv)
+        self.updates += 1
+        if self.on_update is not None and time.time() - self.last_persist >= self.persist_interval:
+            self.last_persist = time.time()
+            self.on_update(self.hoop)
+        return True
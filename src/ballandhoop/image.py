@@ -147,9 +147,9 @@ class Image:
         :rtype: Image
         """
         
-        hoop = ball.hoop
-        if ball is None or hoop is None:
+        if ball is None or ball.hoop is None:
             return self
+        hoop = ball.hoop
         deg = hoop.angle_in_hoop(ball.center)
 
         img = self.plot_line(hoop.center, ball.center)
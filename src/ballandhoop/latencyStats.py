@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+
+class LatencyHistogram:
+    """
+    A histogram of durations with a fixed memory, like a HDR histogram: the buckets grow exponentially, with
+    :py:attr:`SUB_BUCKETS` buckets per power of two, so each percentile is exact to about 4%.
+    Durations from 1 microsecond up to about an hour are kept, everything outside is clipped.
+
+    :ivar counts: the amount of durations per bucket
+    :ivar count: the amount of all durations
+    :ivar max: the longest duration in seconds
+    """
+    SUB_BUCKETS = 16
+    OCTAVES = 32
+    UNIT = 1e-6
+
+    def __init__(self):
+        self.counts = np.zeros(self.SUB_BUCKETS * self.OCTAVES, dtype=np.int64)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """
+        :param seconds: the duration to add
+        """
+        units = seconds / self.UNIT
+        index = 0
+        if units > 1:
+            index = min(int(math.log2(units) * self.SUB_BUCKETS), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: the percentile between 0 and 100
+        :return: the duration in seconds which p percent of the durations do not exceed, NaN if there are none
+        """
+        if self.count == 0:
+            return math.nan
+        index = int(np.searchsorted(np.cumsum(self.counts), math.ceil(self.count * p / 100)))
+        # the upper bound of the bucket, but never more than the longest duration
+        return min(2 ** ((index + 1) / self.SUB_BUCKETS) * self.UNIT, self.max)
+
+    def merge(self, other: LatencyHistogram):
+        """
+        Adds all durations of the other histogram
+        """
+        self.counts += other.counts
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        """
+        Removes all durations
+        """
+        self.counts[:] = 0
+        self.count = 0
+        self.max = 0.0
+
+
+class LatencyStats:
+    """
+    Measures the latency of each stage of a frame, with a fixed memory. The timestamps of a frame are kept in a ring
+    of :py:attr:`frames` rows, so the timestamps of a frame which never finishes (an error, a dropped frame) are just
+    overwritten later. The durations go into a :py:class:`LatencyHistogram` per stage, one for the latest summary
+    interval and one for the whole run.
+
+    The stages of a frame are:
+
+    - capture: from the capture of the frame until it is handed to the scheduler
+    - dispatch: waiting in the scheduler for a free thread-worker
+    - queue: until a thread-worker started the search
+    - detection: the search itself
+    - callback: until the result is back in the main process
+    - reorder: waiting for the older results, see :py:class:`~.reorderBuffer.ReorderBuffer`
+    - network: sending the result, on the server this contains the serial stage
+    - serial: writing the result to the serial port, only on the server, it is measured inside of the network stage,
+      so the two overlap and must not be added up
+    - total: from the capture until the result is sent
+
+    :param frames: the amount of frames whose timestamps are kept at the same time
+    :param summary_interval: the seconds between two summaries, 0 for none
+    :param summary_path: the file the summaries are appended to, also if they are not printed
+    :param verbose: flag if the summaries are printed to the console as well, defaults to False
+    :param kwargs: catch-all parameter, so more entries in the config do not throw an error
+    """
+    STAGES = ('capture', 'dispatch', 'queue', 'detection', 'callback', 'reorder', 'network', 'serial', 'total')
+    MARKS = ('captured', 'submitted', 'dispatched', 'started', 'finished', 'returned', 'emitted')
+
+    def __init__(self, frames: int = 256, summary_interval: float = 10, summary_path: str = 'storage/latency.log',
+                 verbose: bool = False, **kwargs):
+        self.frames = int(frames)
+        self.verbose = verbose
+        self.summary_interval = float(summary_interval)
+        self.summary_path = summary_path
+        self.lock = threading.Lock()
+        self.frame_numbers = np.full(self.frames, -1, dtype=np.int64)
+        self.marks = np.zeros((self.frames, len(self.MARKS)), dtype=np.float64)
+        self.rolling = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.run = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.latest_summary = time.time()
+        if self.summary_path is not None:
+            os.makedirs(os.path.dirname(self.summary_path) or '.', exist_ok=True)
+            open(self.summary_path, 'w').close()
+
+    def start(self, frame_number: int, captured: float):
+        """
+        Starts the timestamps of a frame, its row of the ring is overwritten
+
+        :param frame_number: the number of the frame
+        :param captured: the capture time of the frame
+        """
+        row = frame_number % self.frames
+        with self.lock:
+            self.frame_numbers[row] = frame_number
+            self.marks[row] = 0
+            self.marks[row, 0] = captured
+
+    def mark(self, frame_number: int, mark: str, t: float = None):
+        """
+        Sets a timestamp of a frame, if it is still in the ring
+
+        :param frame_number: the number of the frame
+        :param mark: one of :py:attr:`MARKS`
+        :param t: the timestamp, now if None
+        """
+        row = frame_number % self.frames
+        with self.lock:
+            if self.frame_numbers[row] == frame_number:
+                self.marks[row, self.MARKS.index(mark)] = time.time() if t is None else t
+
+    def captured(self, frame_number: int) -> float:
+        """
+        :param frame_number: the number of the frame
+        :return: the capture time of the frame, 0 if the frame is not in the ring anymore
+        """
+        row = frame_number % self.frames
+        with self.lock:
+            if self.frame_numbers[row] != frame_number:
+                return 0.0
+            return float(self.marks[row, 0])
+
+    def record(self, stage: str, seconds: float):
+        """
+        Adds a duration of a stage which is not measured by the marks of a frame, like the network and serial
+
+        :param stage: one of :py:attr:`STAGES`
+        :param seconds: the duration
+        """
+        with self.lock:
+            self.rolling[stage].record(seconds)
+
+    def finish(self, frame_number: int) -> float | None:
+        """
+        Takes the durations of all stages of a finished frame and frees its row
+
+        :param frame_number: the number of the frame
+        :return: the total seconds of the frame, None if the frame is not in the ring anymore
+        """
+        row = frame_number % self.frames
+        now = time.time()
+        with self.lock:
+            if self.frame_numbers[row] != frame_number:
+                return None
+            marks = list(self.marks[row]) + [now]
+            self.frame_numbers[row] = -1
+            for stage, begin, end in zip(self.STAGES, marks[:-1], marks[1:]):
+                # a stage with a missing timestamp is skipped
+                if begin > 0 and end > 0:
+                    self.rolling[stage].record(max(end - begin, 0))
+            self.rolling['total'].record(max(now - marks[0], 0))
+        return now - marks[0]
+
+    def summarize(self, force: bool = False) -> str | None:
+        """
+        Prints the percentiles of the latest interval and appends them to the :py:attr:`summary_path`, if the
+        interval is over. Starts the next interval then.
+
+        :param force: summarizes even if the interval is not over yet
+        :return: the summary, None if the interval is not over
+        """
+        now = time.time()
+        if not force and (self.summary_interval <= 0 or now - self.latest_summary < self.summary_interval):
+            return None
+        with self.lock:
+            table = self.table(self.rolling)
+            for stage in self.STAGES:
+                self.run[stage].merge(self.rolling[stage])
+                self.rolling[stage].reset()
+            interval = now - self.latest_summary
+            self.latest_summary = now
+        return self.write('Latency of the last ' + str(round(interval, 1)) + 's:\n' + table)
+
+    def close(self) -> str:
+        """
+        Summarizes the latest interval and the whole run
+
+        :return: the summary of the whole run
+        """
+        self.summarize(force=True)
+        with self.lock:
+            table = self.table(self.run)
+        return self.write('Latency of the whole run:\n' + table)
+
+    def table(self, histograms: dict) -> str:
+        """
+        :param histograms: a histogram per stage
+        :return: the table of the percentiles per stage
+        """
+        table = {'stage': [], 'count': [], 'p50 ms': [], 'p95 ms': [], 'p99 ms': [], 'max ms': []}
+        for stage in self.STAGES:
+            histogram = histograms[stage]
+            table['stage'].append(stage)
+            table['count'].append(histogram.count)
+            for p in (50, 95, 99):
+                table['p' + str(p) + ' ms'].append(round(histogram.percentile(p) * 1000, 3))
+            table['max ms'].append(round(histogram.max * 1000, 3))
+        return tabulate(table, headers='keys')
+
+    def write(self, summary: str) -> str:
+        """
+        Prints the summary, if verbose, and appends it to the :py:attr:`summary_path` in any case
+
+        :return: the summary
+        """
+        self.print(summary)
+        if self.summary_path is not None:
+            with open(self.summary_path, 'a') as file:
+                file.write(time.strftime('%Y-%m-%d %H:%M:%S') + ' ' + summary + '\n\n')
+        return summary
+
+    def print(self, msg: str):
+        """
+        Prints the message to stdout, if the stats are verbose, discards otherwise
+
+        :param msg: the message string
+        """
+        if self.verbose:
+            print(msg)
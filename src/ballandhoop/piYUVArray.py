@@ -0,0 +1,40 @@
+from picamera.array import PiArrayOutput, raw_resolution
+
+import numpy as np
+
+
+class PiYUVArray(PiArrayOutput):
+    """
+    A wrapper class which extends :py:class:`picamera.array.PiArrayOutput` and delivers the raw YUV420 capture as
+    planes, without the upscaling of the chroma planes and without the conversion to RGB :py:class:`picamera.array.PiYUVArray` does.
+    The array has the I420 layout OpenCV uses, see :py:func:`~.helper.yuv_planes()` to split it.
+
+    :param camera: the camera object, see parent constructor
+    :type camera: picamera.PiCamera
+    :param size: the size of the frame, see parent constructor
+
+    :ivar array: the frame data with the shape (height * 3 / 2, width)
+    """
+
+    def __init__(self, camera, size=None):
+        super(PiYUVArray, self).__init__(camera, size)
+
+    def flush(self):
+        """
+        This method is called after the data is fully written. It removes the padding of the planes.
+        Note: the picamera has to use the yuv format
+        """
+        super(PiYUVArray, self).flush()
+        width, height = self.size or self.camera.resolution
+        # the camera pads the planes to a width of 32 and a height of 16
+        fwidth, fheight = raw_resolution((width, height))
+        data = np.frombuffer(self.getvalue(), dtype=np.uint8)
+        y_len = fwidth * fheight
+        uv_len = (fwidth // 2) * (fheight // 2)
+        y = data[:y_len].reshape(fheight, fwidth)[:height, :width]
+        u = data[y_len:y_len + uv_len].reshape(fheight // 2, fwidth // 2)[:height // 2, :width // 2]
+        v = data[y_len + uv_len:y_len + 2 * uv_len].reshape(fheight // 2, fwidth // 2)[:height // 2, :width // 2]
+        self.array = np.empty((height * 3 // 2, width), dtype=np.uint8)
+        self.array[:height] = y
+        self.array[height:height + height // 4] = u.reshape(height // 4, width)
+        self.array[height + height // 4:] = v.reshape(height // 4, width)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import threading
+
+ROLES = ('capture', 'workers', 'network')
+"""
+The roles which can be placed by the `placement` config:
+
+- capture: the main loop and the capture thread of the :py:class:`~.videostream.VideoStream`
+- workers: each thread-worker, a process or a thread
+- network: the thread of the :py:class:`~network.Server` and the result thread of the pool, which sends the results
+  to the network and the serial port
+
+With the asyncio runtime (see :py:class:`~.asyncRuntime.AsyncRuntime`) the network runs in the event loop, which is
+placed as capture, and the result thread of the pool only hands the results over.
+"""
+
+POLICIES = {
+    'other': 'SCHED_OTHER',
+    'fifo': 'SCHED_FIFO',
+    'rr': 'SCHED_RR',
+}
+"""
+The scheduling policies by their name in the config
+"""
+
+
+def place(tid: int = 0, cpus: list = None, policy: str = None, priority: int = 1, nice: int = None,
+          **kwargs) -> list:
+    """
+    Pins a thread to cpus and sets its scheduling policy and niceness. Linux allows all of them per thread.
+    Anything which is not allowed (e.g. a real-time policy without root) is skipped.
+
+    :param tid: the native id of the thread, 0 for the calling thread
+    :param cpus: the cpu numbers the thread may run on, all if None
+    :param policy: one of :py:data:`POLICIES`, unchanged if None
+    :param priority: the real-time priority (1-99) for the fifo and rr policy
+    :param nice: the niceness (-20 to 19), unchanged if None
+    :return: the problems, if anything could not be set
+    :rtype: list[str]
+    """
+    problems = []
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(tid, [int(c) for c in cpus])
+        except (AttributeError, OSError, ValueError) as e:
+            problems.append('cpus ' + str(cpus) + ' not set: ' + str(e))
+    if policy is not None:
+        if policy not in POLICIES:
+            raise Exception('Unknown scheduling policy "' + str(policy) + '", known are: ' + ', '.join(POLICIES))
+        try:
+            value = getattr(os, POLICIES[policy])
+            os.sched_setscheduler(tid, value, os.sched_param(0 if policy == 'other' else int(priority)))
+        except (AttributeError, OSError) as e:
+            problems.append('policy ' + policy + ' not set: ' + str(e))
+    if nice is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, int(nice))
+        except (AttributeError, OSError) as e:
+            problems.append('nice ' + str(nice) + ' not set: ' + str(e))
+    return problems
+
+
+def describe(tid: int = 0) -> str:
+    """
+    :param tid: the native id of the thread, 0 for the calling thread
+    :return: the effective cpus, policy and niceness of the thread
+    """
+    try:
+        cpus = ','.join(str(c) for c in sorted(os.sched_getaffinity(tid)))
+        value = os.sched_getscheduler(tid)
+        policy = next((name for name, attr in POLICIES.items() if getattr(os, attr) == value), str(value))
+        if policy != 'other':
+            policy += ' ' + str(os.sched_getparam(tid).sched_priority)
+        nice = os.getpriority(os.PRIO_PROCESS, tid)
+    except (AttributeError, OSError) as e:
+        return 'unknown (' + str(e) + ')'
+    return 'cpus ' + cpus + ', policy ' + policy + ', nice ' + str(nice)
+
+
+def place_role(role: str, placement: dict = None, tid: int = None, name: str = None) -> str:
+    """
+    Places a thread like the config of its role says and prints the effective placement
+
+    :param role: one of :py:data:`ROLES`
+    :param placement: the `placement` config, a dict of role configs with the parameters of :py:func:`place()`
+    :param tid: the native id of the thread, the calling thread if None
+    :param name: the name of the thread in the output, the role if None
+    :return: the printed line
+    """
+    if tid is None:
+        tid = threading.get_native_id()
+    problems = place(tid, **((placement or {}).get(role) or {}))
+    line = '[PLACEMENT] ' + (name or role) + ' (' + str(tid) + '): ' + describe(tid)
+    for problem in problems:
+        line += '\n[PLACEMENT] WARN: ' + problem
+    print(line)
+    return line
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import functools
+import math
+
+import cv2
+import numpy as np
+
+
+class PolarUnwrap:
+    """
+    Unwraps the ring inside the hoop, where the ball can be, into a narrow strip.
+    Each column of the strip is one angle step of the hoop :py:attr:`~.hoop.Hoop.fov` sector, each row one pixel of
+    the radius, the outermost row first. The remap maps are calculated once in the constructor, use
+    :py:meth:`cached()` to get them once per process.
+
+    :param center: the center of the hoop
+    :param radius: the radius of the hoop
+    :param fov: the 2-tuple of the starting and ending angle of the sector, like in :py:class:`~.hoop.Hoop`
+    :param shape: the shape of the frames, only height and width are relevant
+    :param band: the width of the ring in pixels, measured from the hoop radius inwards
+    :param step: the angle of one column in degree
+
+    :ivar thetas: the angle of each column in degree, measured like :py:func:`cv2.ellipse()` does
+    :ivar radii: the radius of each row
+    """
+
+    def __init__(self, center: tuple, radius: int, fov: tuple, shape: tuple, band: int, step: float = 0.5):
+        self.center = center
+        self.step = step
+        # cv2.ellipse, and so the sector mask, measures the fov angles shifted by 90 degree
+        self.thetas = np.arange(fov[0] - 90, fov[1] - 90, step, dtype=np.float32)
+        self.radii = np.arange(radius, max(radius - band, 0), -1, dtype=np.float32)
+        t = np.deg2rad(self.thetas)[np.newaxis, :]
+        r = self.radii[:, np.newaxis]
+        map_x = (center[0] + r * np.cos(t)).astype(np.float32)
+        map_y = (center[1] + r * np.sin(t)).astype(np.float32)
+        # points outside the frame are mapped to the border value (black) by cv2.remap
+        map_x[(map_x < 0) | (map_x > shape[1] - 1)] = -1
+        map_y[(map_y < 0) | (map_y > shape[0] - 1)] = -1
+        # the fixed point maps are a lot faster to remap with
+        self.map1, self.map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=True)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def cached(center: tuple, radius: int, fov: tuple, shape: tuple, band: int, step: float = 0.5) -> PolarUnwrap:
+        """
+        Gives the unwrapping for the parameters, the maps are only calculated once per process
+
+        :rtype: PolarUnwrap
+        """
+        return PolarUnwrap(center, radius, fov, shape, band, step)
+
+    def unwrap(self, frame):
+        """
+        Unwraps the ring of the frame into the strip
+
+        :param frame: the frame array, any color space
+        :return: the strip array with the shape (band, columns, channels)
+        """
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_NEAREST)
+
+    def locate(self, mask, min_chord: int = 2):
+        """
+        Searches the ball in the mask of the strip. The amount of mask pixels per column gives a 1D profile.
+        The ball is the contiguous run of columns with at least `min_chord` mask pixels which has the most pixels, so
+        speckles and the gaps between them are no run. The weighted
+        mean column of the run gives an angle much finer than a column, the extent of the run the radius of the ball.
+        If the strip is a full circle, a run may go over its seam.
+
+        :param mask: the mask of the strip
+        :param min_chord: the minimal amount of mask pixels of a column of the ball, defaults to 2
+        :return: the angle in degree (measured like :py:func:`cv2.ellipse()`), the distance from the hoop center,
+            the radius of the ball and the amount of mask pixels, or None if there is no run at all
+        :rtype: (float, float, float, int) | None
+        """
+        profile = cv2.reduce(mask, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+        n = len(profile)
+        covered = profile >= max(min_chord, 1)
+        if not covered.any():
+            return None
+        start = 0
+        if len(self.thetas) * self.step >= 360:
+            if covered.all():
+                return None
+            # start at an empty column, so a run over the seam is not split
+            start = int(np.argmin(covered))
+        covered = np.roll(covered, -start)
+        rolled = np.roll(profile, -start)
+        # the edges of the runs, each run goes from begins[i] to ends[i] (exclusive)
+        edges = np.diff(np.concatenate(([0], covered.view(np.int8), [0])))
+        begins, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        cumulated = np.concatenate(([0], np.cumsum(rolled)))
+        sums = cumulated[ends] - cumulated[begins]
+        best = int(np.argmax(sums))
+        width = ends[best] - begins[best]
+        weights = rolled[begins[best]:ends[best]]
+        count = int(weights.sum())
+        # unwrap the columns over the seam for the mean
+        col = start + begins[best] + float(np.dot(weights, np.arange(width))) / count
+        theta = float(self.thetas[0]) + col * self.step
+        # the mean radius of the ball pixels gives the distance of the ball center from the hoop center
+        cols = (np.arange(begins[best], ends[best]) + start) % n
+        rows = cv2.reduce(np.ascontiguousarray(mask[:, cols]), 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+        distance = float(np.dot(rows, self.radii)) / max(int(rows.sum()), 1)
+        # the run covers the diameter of the ball
+        radius = width * math.radians(self.step) * distance / 2
+        return theta, distance, radius, count
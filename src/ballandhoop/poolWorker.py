@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import multiprocessing.pool
+import threading
+import time
+
+from src.ballandhoop.ball import Ball
+from src.ballandhoop.debugSink import set_writer
+from src.ballandhoop.detectors import create_detector, Detector
+from src.ballandhoop.frameRing import FrameRing
+from src.ballandhoop.hoop import Hoop
+from src.ballandhoop.placement import place_role
+from src.ballandhoop.qualityController import scale_configs
+
+# the state of this thread-worker, set once by init_worker(), per thread if the thread-workers are threads
+_worker = threading.local()
+
+MODES = ('process', 'thread', 'inline')
+"""
+The execution modes of the thread-workers, see :py:func:`create_pool()`
+"""
+
+
+class BallResult:
+    """
+    The compact result of a frame, which is sent back from the thread-worker instead of a :py:class:`.Ball`
+    (which would pickle its whole :py:class:`.Hoop` with it). It has a fixed layout and is pickled as a plain tuple.
+
+    :param frame_number: the number of the frame
+    :param angle: the angle of the ball, NaN if there is none
+    :param center: the center of the ball, (-1, -1) if there is none
+    :param radius: the radius of the ball, 0 if there is none
+    :param confidence: the confidence of the detector, 0 if there is no ball or the detector does not tell
+    :param flags: the bits :py:attr:`FOUND` and :py:attr:`PRECISE`
+    :param started: the time the search started, 0 if unknown
+    :param finished: the time the search finished, 0 if unknown
+    """
+    __slots__ = ('frame_number', 'angle', 'center', 'radius', 'confidence', 'flags', 'started', 'finished')
+
+    FOUND = 1
+    """
+    A ball was found
+    """
+    PRECISE = 2
+    """
+    The angle was measured more precise than the center allows, see :py:attr:`.Ball.precise_angle`
+    """
+
+    def __init__(self, frame_number: int, angle: float = math.nan, center: tuple = (-1, -1), radius: int = 0,
+                 confidence: float = 0.0, flags: int = 0, started: float = 0.0, finished: float = 0.0):
+        self.frame_number = frame_number
+        self.angle = angle
+        self.center = center
+        self.radius = radius
+        self.confidence = confidence
+        self.flags = flags
+        self.started = started
+        self.finished = finished
+
+    def __reduce__(self):
+        return BallResult, (self.frame_number, self.angle, self.center, self.radius, self.confidence, self.flags,
+                            self.started, self.finished)
+
+    @staticmethod
+    def from_ball(frame_number: int, ball: Ball | None) -> BallResult:
+        """
+        :param frame_number: the number of the frame
+        :param ball: the found ball, if any
+        :rtype: BallResult
+        """
+        if ball is None:
+            return BallResult(frame_number)
+        flags = BallResult.FOUND
+        if ball.precise_angle is not None:
+            flags |= BallResult.PRECISE
+        confidence = ball.confidence if ball.confidence is not None else 0.0
+        return BallResult(frame_number, float(ball.angle()), tuple(ball.center), ball.radius, float(confidence), flags)
+
+    def found(self) -> bool:
+        """
+        :return: flag if a ball was found
+        """
+        return bool(self.flags & BallResult.FOUND)
+
+
+class InlinePool:
+    """
+    Has the interface of :py:class:`multiprocessing.pool.Pool` which is used by the
+    :py:class:`~.frameScheduler.FrameScheduler`, but runs each task at once in the calling thread
+
+    :param initializer: called once with the initargs, like the initializer of a pool
+    :param initargs: the arguments of the initializer
+    """
+
+    def __init__(self, initializer=None, initargs=()):
+        if initializer is not None:
+            initializer(*initargs)
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        """
+        Runs the function and calls the callback (or the error callback) before it returns
+        """
+        try:
+            result = func(*args)
+        except Exception as e:
+            if error_callback is not None:
+                error_callback(e)
+            return
+        if callback is not None:
+            callback(result)
+
+    def terminate(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_pool(mode: str = 'process', processes: int = None, initializer=None, initargs=()):
+    """
+    Creates the thread-workers for the execution mode
+
+    - process: a :py:class:`multiprocessing.pool.Pool`, each thread-worker is a process of its own.
+      The frames are pickled (or sent via a :py:class:`~.frameRing.FrameRing`) and the results as well.
+    - thread: a :py:class:`multiprocessing.pool.ThreadPool`, there is nothing to pickle. The heavy OpenCV calls
+      release the GIL, so the threads run in parallel most of the time.
+    - inline: a :py:class:`InlinePool`, the frames are searched one after the other in the main loop
+
+    :param mode: one of :py:data:`MODES`
+    :param processes: the amount of thread-workers, ignored for inline
+    :param initializer: called once per thread-worker with the initargs, see :py:func:`init_worker()`
+    :param initargs: the arguments of the initializer
+    :return: the pool
+    """
+    if mode == 'process':
+        return multiprocessing.Pool(processes=processes, initializer=initializer, initargs=initargs)
+    if mode == 'thread':
+        return multiprocessing.pool.ThreadPool(processes=processes, initializer=initializer, initargs=initargs)
+    if mode == 'inline':
+        return InlinePool(initializer=initializer, initargs=initargs)
+    raise Exception('Unknown execution mode "' + str(mode) + '", known are: ' + ', '.join(MODES))
+
+
+def init_worker(hoop_config: dict, ball_config: dict, geometry=None, placement: dict = None, debug_writer=None):
+    """
+    The initializer of the thread-worker pool. Each thread-worker gets the configs only once and keeps its detector
+    (with all its precomputed masks and tables) for all frames. The state is kept per thread, so the thread-workers
+    of a thread pool do not share a detector either.
+    The hoop geometry and the resolution can change while running (see :py:class:`~.hoopDrift.HoopDriftTracker`
+    and :py:class:`~.qualityController.QualityController`), so they are shared with the main process,
+    see :py:func:`set_geometry()`.
+
+    :param hoop_config: the hoop config
+    :param ball_config: the ball config
+    :param geometry: a shared array (generation, center x, center y, radius, scale x, scale y),
+        see :py:func:`shared_geometry()`
+    :param placement: the placement config, the thread-worker places itself like its `workers` entry says,
+        see :py:func:`~.placement.place_role()`. Not placed if None.
+    :param debug_writer: the :py:class:`~.debugWriter.DebugWriter` the debug pictures are handed to, they are saved
+        in the search if None
+    """
+    set_writer(debug_writer)
+    if placement is not None:
+        place_role('workers', placement, name='worker ' + multiprocessing.current_process().name + ' ' +
+                   threading.current_thread().name)
+    _worker.hoop_config = dict(hoop_config)
+    _worker.ball_config = dict(ball_config)
+    _worker.geometry = geometry
+    _worker.generation = None
+    _worker.scale = (1, 1)
+    _worker.detector = create_detector(Hoop(**_worker.hoop_config), _worker.ball_config)
+
+
+def shared_geometry(hoop: Hoop):
+    """
+    Creates the shared array for the hoop geometry, has to be created before the pool
+
+    :param hoop: the hoop at startup
+    :return: the shared array (generation, center x, center y, radius, scale x, scale y)
+    """
+    return multiprocessing.Array('d', [0, hoop.center[0], hoop.center[1], hoop.radius, 1, 1])
+
+
+def set_geometry(geometry, hoop: Hoop, scale: tuple = (1, 1)):
+    """
+    Publishes a moved hoop or another resolution to all thread-workers, they build their detector again with their
+    next frame
+
+    :param geometry: the shared array of :py:func:`shared_geometry()`
+    :param hoop: the (moved) hoop in the configured resolution
+    :param scale: the factors (x, y) from the configured resolution to the current one,
+        see :py:func:`~.qualityController.scale_configs()`
+    """
+    with geometry.get_lock():
+        geometry[1], geometry[2], geometry[3] = hoop.center[0], hoop.center[1], hoop.radius
+        geometry[4], geometry[5] = scale
+        geometry[0] += 1
+
+
+def _current_detector() -> Detector:
+    """
+    :return: the detector of this process, built again if the hoop moved or the resolution changed
+    """
+    geometry = _worker.geometry
+    if geometry is not None and geometry[0] != _worker.generation:
+        with geometry.get_lock():
+            generation, x, y, radius, sx, sy = geometry[:]
+        if generation != 0:
+            hoop_config = dict(_worker.hoop_config, center=[int(x), int(y)], radius=int(radius))
+            hoop_config, ball_config = scale_configs(hoop_config, _worker.ball_config, (sx, sy))
+            # in another resolution the frames have another shape, the detector prepares itself with the next one
+            shape = _worker.detector.shape if (sx, sy) == _worker.scale else None
+            _worker.detector = create_detector(Hoop(**hoop_config), ball_config, shape)
+            _worker.scale = (sx, sy)
+        _worker.generation = generation
+    return _worker.detector
+
+
+def detect(frame_number: int, frame, dir_path: str = None, search_window: tuple = None) -> BallResult:
+    """
+    Searches the ball in the frame with the detector of this thread-worker
+
+    :param frame_number: the number of the frame
+    :param frame: the frame as delivered by the camera
+    :param dir_path: the directory where debugging pictures will be saved, if any
+    :param search_window: the predicted search window of the :py:class:`~.tracker.BallTracker`, if any
+    :rtype: BallResult
+    """
+    started = time.time()
+    ball = _current_detector().detect(frame, frame_number, dir_path, search_window)
+    result = BallResult.from_ball(frame_number, ball)
+    result.started, result.finished = started, time.time()
+    return result
+
+
+def detect_slot(ring: FrameRing, slot: int, frame_number: int, dir_path: str = None,
+                search_window: tuple = None) -> BallResult:
+    """
+    Same as :py:func:`detect()`, but the frame is read from a slot of the shared memory ring
+
+    :param ring: the ring the frame is in, only its name is pickled
+    :param slot: the index of the slot
+    :rtype: BallResult
+    """
+    return detect(frame_number, ring.frame(slot), dir_path, search_window)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from src.ballandhoop.latencyStats import LatencyHistogram
+from src.ballandhoop.videostream import VideoStream
+
+
+def scale_configs(hoop_config: dict, ball_config: dict, scale: tuple) -> tuple:
+    """
+    Scales the pixel values of the configs, which are calibrated in the configured resolution, to another resolution.
+    The resolutions do not all have the same aspect ratio, so the positions are scaled per axis and the radii by the
+    mean of both.
+
+    :param hoop_config: the hoop config
+    :param ball_config: the ball config
+    :param scale: the factors (x, y) from the configured resolution to the other one
+    :return: the scaled hoop config and ball config, as copies
+    :rtype: tuple[dict, dict]
+    """
+    sx, sy = scale
+    sr = (sx + sy) / 2
+    hoop_config = dict(hoop_config,
+                       center=[int(round(hoop_config['center'][0] * sx)), int(round(hoop_config['center'][1] * sy))],
+                       radius=int(round(hoop_config['radius'] * sr)),
+                       center_dots=[[int(round(x * sx)), int(round(y * sy))] for x, y in hoop_config['center_dots']],
+                       radius_dots=[max(int(round(r * sr)), 1) for r in hoop_config['radius_dots']])
+    ball_config = dict(ball_config)
+    for key in ('min_radius', 'max_radius', 'polar_band'):
+        if ball_config.get(key) is not None:
+            ball_config[key] = max(int(round(ball_config[key] * sr)), 1)
+    return hoop_config, ball_config
+
+
+class QualityController:
+    """
+    Runs the best resolution and framerate which still fits the latency budget. The quality levels are all
+    combinations of the resolutions and framerates within the bounds, ordered by resolution first and framerate second.
+    Every `interval` seconds the latency of the sent results and the backlog (frames dropped by the
+    :py:class:`~.frameScheduler.FrameScheduler` or overwritten by the capture thread) are checked:
+
+    - if the 95th percentile is over the budget or frames were dropped, a lower level is taken at once, see
+      :py:meth:`lower_level()`. It never has a higher framerate or resolution than the current one.
+    - if the 95th percentile stayed below `headroom` times the budget without any drop for `up_intervals` checks in a
+      row, the next higher level is tried
+
+    The results of frames which were captured before a change are ignored.
+
+    :param resolution_no: the configured resolution number, the start level
+    :param framerate: the configured framerate, the start level
+    :param latency_budget: the seconds the 95th percentile of the latency from capture to send may take
+    :param min_resolution_no: the lowest resolution number which may be used
+    :param max_resolution_no: the highest resolution number which may be used
+    :param min_framerate: the lowest framerate which may be used
+    :param max_framerate: the highest framerate which may be used
+    :param framerate_step: the framerate is changed in steps of this size
+    :param interval: the seconds between two checks
+    :param headroom: the part of the budget the latency has to stay below to take a higher level
+    :param up_intervals: the amount of good checks in a row before a higher level is taken
+    :param min_results: a check with less results is not decided yet and waits for more
+    :param kwargs: catch-all parameter, so more entries in the config do not throw an error
+
+    :ivar levels: the (resolution number, framerate) of each level, from the lowest to the best
+    :ivar level: the index of the current level
+    :ivar histogram: the latency of the results since the last check
+    :ivar changes: the amount of level changes
+    """
+
+    def __init__(self, resolution_no: int = 1, framerate: int = 60, latency_budget: float = 0.05,
+                 min_resolution_no: int = 0, max_resolution_no: int = 2, min_framerate: int = 40,
+                 max_framerate: int = 90, framerate_step: int = 10, interval: float = 2, headroom: float = 0.6,
+                 up_intervals: int = 3, min_results: int = 30, **kwargs):
+        self.latency_budget = float(latency_budget)
+        self.interval = float(interval)
+        self.headroom = float(headroom)
+        self.up_intervals = int(up_intervals)
+        self.min_results = int(min_results)
+        resolutions = [no for no in sorted(VideoStream.resolutions) if min_resolution_no <= no <= max_resolution_no]
+        framerates = list(range(int(min_framerate), int(max_framerate) + 1, int(framerate_step)))
+        if len(resolutions) == 0 or len(framerates) == 0:
+            raise Exception('The bounds of the adaptive quality leave no resolution or framerate')
+        levels = {(no, rate) for no in resolutions for rate in framerates}
+        # the configured level is always a level, even if it is out of the bounds or steps
+        levels.add((resolution_no, framerate))
+        self.levels = sorted(levels)
+        self.level = self.levels.index((resolution_no, framerate))
+        self.lock = threading.Lock()
+        self.histogram = LatencyHistogram()
+        self.first_frame_number = 0
+        self.latest_check = time.time()
+        self.latest_backlog = 0
+        self.good_intervals = 0
+        self.changes = 0
+
+    def observe(self, frame_number: int, seconds: float):
+        """
+        Adds the latency of a sent result, called from the result callback
+
+        :param frame_number: the number of the frame
+        :param seconds: the seconds from the capture until the result was sent
+        """
+        with self.lock:
+            if frame_number >= self.first_frame_number:
+                self.histogram.record(seconds)
+
+    def lower_level(self, level: int) -> int:
+        """
+        Gives the level to take if the current one is too slow. The framerate is lowered first, within the current
+        resolution. Only at its lowest framerate the resolution is lowered, at the highest framerate which is not
+        above the current one. The next lower level in the order would more than double the framerate there,
+        e.g. from 320x240 at 40 fps to 160x128 at 90 fps.
+
+        :param level: the index of the current level
+        :return: the index of the lower level, the same if there is none
+        :rtype: int
+        """
+        _, framerate = self.levels[level]
+        if level == 0:
+            return level
+        # a configured framerate below the bounds has no lower one, then the lowest framerate is taken
+        framerate = max(framerate, min(rate for _, rate in self.levels[:level]))
+        lower = [(no, rate) for no, rate in self.levels[:level] if rate <= framerate]
+        # the levels are sorted, so the last one has the highest resolution and framerate of them
+        return self.levels.index(lower[-1])
+
+    def update(self, frame_number: int, backlog: int) -> tuple | None:
+        """
+        Called for each frame in the main loop, checks the latency if the interval is over
+
+        :param frame_number: the number of the current frame
+        :param backlog: the amount of dropped and overwritten frames since the start
+        :return: the (resolution number, framerate) to change to, None to keep the current one
+        :rtype: tuple[int, int] | None
+        """
+        now = time.time()
+        if now - self.latest_check < self.interval:
+            return None
+        dropped = backlog - self.latest_backlog
+        with self.lock:
+            if self.histogram.count < self.min_results and dropped == 0:
+                return None
+            p95 = self.histogram.percentile(95)
+            self.histogram.reset()
+        self.latest_check = now
+        self.latest_backlog = backlog
+        level = self.level
+        if dropped > 0 or p95 > self.latency_budget:
+            self.good_intervals = 0
+            level = self.lower_level(level)
+        elif p95 < self.headroom * self.latency_budget:
+            self.good_intervals += 1
+            if self.good_intervals >= self.up_intervals:
+                self.good_intervals = 0
+                level = min(level + 1, len(self.levels) - 1)
+        else:
+            self.good_intervals = 0
+        if level == self.level:
+            return None
+        self.level = level
+        self.changes += 1
+        with self.lock:
+            # the frames in work were captured with the old level
+            self.first_frame_number = frame_number + 1
+            self.histogram.reset()
+        return self.levels[level]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class ReorderBuffer:
+    """
+    Brings the results of the thread-workers back into frame order. A result which is newer than the next expected
+    frame waits, until the older results arrived, but at most `reorder_deadline` seconds. After that the missing
+    frames are skipped. Only a result which arrives after its frame was skipped is still out of order.
+    Frames which were never sent to a thread-worker (see :py:class:`~.frameScheduler.FrameScheduler`) are announced
+    with :py:meth:`drop()`, so nobody waits for them.
+    The callbacks are not called with the :py:attr:`lock` held, because they may block (e.g. on the network). The
+    results which are ready are queued in order and handed over by one thread at a time, the other threads return
+    at once.
+
+    :param reorder_deadline: the maximal seconds a result waits for the older ones, 0 does not wait at all
+    :param on_result: called with the frame number and the result, in frame order
+    :param on_late: called with the frame number and the result of a frame which was skipped already
+
+    :ivar next_frame_number: the frame which is expected next
+    :ivar waiting: the results which wait for older ones, with their arrival time, by frame number
+    :ivar dropped: the frame numbers which will not arrive
+    :ivar outbox: the (callback, frame number, result) which are ready to be handed over, in order
+    :ivar sending: flag if a thread is handing over the outbox right now
+    :ivar emitted: the amount of results handed over in order
+    :ivar skipped: the amount of frames which were skipped after the deadline
+    :ivar late: the amount of results which arrived after their frame was skipped
+    """
+
+    def __init__(self, reorder_deadline: float = 0.02, on_result=None, on_late=None, **kwargs):
+        self.deadline = float(reorder_deadline)
+        self.on_result = on_result
+        self.on_late = on_late
+        self.lock = threading.Lock()
+        self.next_frame_number = 1
+        self.waiting = {}
+        self.dropped = set()
+        self.outbox = []
+        self.sending = False
+        self.emitted = 0
+        self.skipped = 0
+        self.late = 0
+
+    def push(self, frame_number: int, result):
+        """
+        Adds the result of a frame and hands over all results which are in order now
+
+        :param frame_number: the number of the frame
+        :param result: the result, which is given to the callback as it is
+        """
+        with self.lock:
+            if frame_number < self.next_frame_number:
+                self.late += 1
+                if self.on_late is not None:
+                    self.outbox.append((self.on_late, frame_number, result))
+            else:
+                self.waiting[frame_number] = (time.monotonic(), result)
+                self.release()
+        self.send()
+
+    def drop(self, frame_number: int):
+        """
+        Announces a frame which will have no result
+
+        :param frame_number: the number of the frame
+        """
+        with self.lock:
+            if frame_number >= self.next_frame_number:
+                self.dropped.add(frame_number)
+                self.release()
+        self.send()
+
+    def flush(self):
+        """
+        Skips the missing frames whose newer results waited longer than the deadline. Called regularly, so the
+        results are handed over in time even if no new result arrives.
+        """
+        with self.lock:
+            self.release()
+        self.send()
+
+    def send(self):
+        """
+        Calls the callbacks of the queued results, without the :py:attr:`lock` held. If another thread is doing
+        this already, it also takes the results of this thread, so this thread does not wait.
+        """
+        with self.lock:
+            if self.sending:
+                return
+            self.sending = True
+        while True:
+            with self.lock:
+                if not self.outbox:
+                    self.sending = False
+                    return
+                batch, self.outbox = self.outbox, []
+            try:
+                for callback, frame_number, result in batch:
+                    callback(frame_number, result)
+            except BaseException:
+                with self.lock:
+                    self.sending = False
+                raise
+
+    def release(self):
+        """
+        Queues the results in order, as long as there is no gap which is still in its deadline.
+        Has to be called with the :py:attr:`lock` held, the callbacks are called by :py:meth:`send()` afterwards.
+        """
+        while self.waiting or self.dropped:
+            if self.next_frame_number in self.dropped:
+                self.dropped.discard(self.next_frame_number)
+                self.next_frame_number += 1
+                continue
+            if self.next_frame_number in self.waiting:
+                _, result = self.waiting.pop(self.next_frame_number)
+                self.emitted += 1
+                if self.on_result is not None:
+                    self.outbox.append((self.on_result, self.next_frame_number, result))
+                self.next_frame_number += 1
+                continue
+            if not self.waiting:
+                break
+            oldest = min(arrival for arrival, _ in self.waiting.values())
+            if time.monotonic() - oldest < self.deadline:
+                break
+            # the missing frames took too long, go on with the oldest result which arrived
+            first = min(self.waiting)
+            missing = range(self.next_frame_number, first)
+            self.skipped += sum(1 for n in missing if n not in self.dropped)
+            self.dropped.difference_update(missing)
+            self.next_frame_number = first
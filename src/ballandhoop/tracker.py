@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import math
+import threading
+
+
+class BallTracker:
+    """
+    Predicts a small search window for the next frames out of the latest found balls.
+    The ball moves along the hoop, so its angular velocity around the hoop center is extrapolated.
+    The tracker lives in the main process: the window is given to the thread-worker together with the frame and the
+    results are fed back in the callback. Results may arrive out of order, results older than the newest one
+    are ignored.
+
+    :param hoop: the hoop the ball is moving in
+    :param max_radius: the maximal radius a ball is allowed to have, the window is at least twice as big
+    :param margin: additional pixels which are added to each side of the window
+    :param max_frame_gap: if the newest result is older than this amount of frames, no window is predicted
+    :param refresh_interval: every this many frames the full sector is searched anyway, so the tracker can not stick
+        to a wrong but ball colored spot forever
+    :param kwargs: a catch-all parameter, so the ball config can be used as parameter
+
+    :ivar history: up to two of the latest (frame_number, angle, distance) tuples, angle in rad around the hoop center
+    :ivar latest_frame_number: the newest frame number which had a result, found or not
+    """
+
+    def __init__(self, hoop: Hoop, max_radius: int = 20, margin: int = 4, max_frame_gap: int = 10,
+                 refresh_interval: int = 30, **kwargs):
+        self.hoop = hoop
+        self.max_radius = int(max_radius)
+        self.margin = int(margin)
+        self.max_frame_gap = int(max_frame_gap)
+        self.refresh_interval = int(refresh_interval)
+        self.history = []
+        self.latest_frame_number = 0
+        self.lock = threading.Lock()
+
+    def update(self, frame_number: int, ball: Ball):
+        """
+        Feeds the result of a frame into the tracker. Called from the result callback.
+
+        :param frame_number: the number of the frame the result belongs to
+        :param ball: the found ball or None if it was lost
+        """
+        with self.lock:
+            if frame_number <= self.latest_frame_number:
+                # an older frame finished later than a newer one, it has no new information
+                return
+            self.latest_frame_number = frame_number
+            if ball is None:
+                # lost the ball, search the full sector until it is found again
+                self.history = []
+                return
+            dx = ball.center[0] - self.hoop.center[0]
+            dy = ball.center[1] - self.hoop.center[1]
+            self.history = self.history[-1:] + [(frame_number, math.atan2(dy, dx), math.hypot(dx, dy))]
+
+    def predict_window(self, frame_number: int):
+        """
+        Predicts where the ball will be in the given frame
+
+        :param frame_number: the number of the frame which will be searched
+        :return: the search window (x, y, w, h) or None if the full sector has to be searched
+        :rtype: tuple | None
+        """
+        if self.refresh_interval > 0 and frame_number % self.refresh_interval == 0:
+            return None
+        with self.lock:
+            history = self.history
+        if len(history) == 0:
+            return None
+        last_frame, angle, distance = history[-1]
+        gap = frame_number - last_frame
+        if gap > self.max_frame_gap:
+            return None
+        velocity = 0.0
+        spread = 2 * self.max_radius
+        if len(history) == 2:
+            prev_frame, prev_angle, _ = history[0]
+            # shortest angle difference, so crossing the +-180 degree border works
+            delta = (angle - prev_angle + math.pi) % (2 * math.pi) - math.pi
+            velocity = delta / (last_frame - prev_frame)
+            angle = angle + velocity * gap
+        else:
+            # the direction is unknown yet, so make the window bigger
+            spread = 4 * self.max_radius
+        # the window grows with the expected movement, because the velocity is only an estimate
+        half = spread + self.margin + int(abs(velocity) * distance * gap / 2)
+        x = int(self.hoop.center[0] + distance * math.cos(angle))
+        y = int(self.hoop.center[1] + distance * math.sin(angle))
+        return x - half, y - half, 2 * half, 2 * half
+
+    def rescale(self, hoop: Hoop, max_radius: int, frame_number: int):
+        """
+        Switches to the hoop and ball size of another resolution. The latest results are in the pixels of the old
+        resolution, so they are forgotten and the results of the frames before the switch are ignored.
+
+        :param hoop: the hoop in the new resolution
+        :param max_radius: the maximal radius of the ball in the new resolution
+        :param frame_number: the first frame in the new resolution
+        """
+        with self.lock:
+            self.hoop = hoop
+            self.max_radius = int(max_radius)
+            self.history = []
+            self.latest_frame_number = max(self.latest_frame_number, frame_number - 1)
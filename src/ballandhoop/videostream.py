@@ -1,9 +1,14 @@
 # import the necessary packages
 import os.path
+import queue
+import threading
 import time
 import cv2
+import numpy as np
 from imutils.video import FPS
 
+from src.ballandhoop.frameRing import FrameRing
+
 
 class VideoStream:
     """
@@ -13,9 +18,25 @@ class VideoStream:
     :param framerate: the framerate, should be between 60 and 90 in sensor mode 7
     :param rotation: the rotation
     :param as_hsv: if output should be hsv or bgr
+    :param as_yuv: if set, the output is the raw YUV420 capture in the I420 layout, see :py:func:`~.helper.yuv_planes()`.
+        This skips all color conversions, rotation is not supported then
     :param wb_gains: the white_balancing gains
     :param faker_path: if this directory is set, the camera will not be used, but the pictures saved there. Can be recorded through debug.py
+    :param ring_slots: if bigger than 0, the frames are written into a :py:class:`~.frameRing.FrameRing` with this
+        amount of slots, see :py:attr:`slot`. The slot has to be released after the frame is not used anymore.
+    :param capture_thread: if set, a background thread reads the frames from the camera (or the faker pictures, at
+        the framerate then) all the time, and only the newest frame is handed out. Frames which were not taken before
+        the next one arrived are overwritten (and their ring slot is released).
     :param kwargs: catch-all parameter, so more entries in the config do not throw an error
+
+    :ivar resolution_no: the resolution number the frames are captured with now, see :py:meth:`reconfigure()`
+    :ivar ring: the shared memory ring of the latest frame, if `ring_slots` is set. A ring is created with the first
+        frame of each frame shape, see :py:meth:`to_ring()`
+    :ivar rings: all rings by their frame shape
+    :ivar slot: the slot index of the latest frame in the ring
+    :ivar timestamp: the time the latest frame was captured
+    :ivar sequence: the number of the latest frame, counted by the capture, so overwritten frames leave a gap
+    :ivar overwritten: the amount of frames the capture thread overwrote before they were taken
     """
 
     resolutions = {
@@ -36,42 +57,56 @@ class VideoStream:
     The available rotation numbers
     """
 
-    def __init__(self, resolution_no=1, framerate=60, rotation=0, as_hsv=True, wb_gains=None, faker_path=None, **kwargs):
-        resolution = self.resolutions[resolution_no]
+    def __init__(self, resolution_no=1, framerate=60, rotation=0, as_hsv=True, wb_gains=None, faker_path=None,
+                 as_yuv=False, ring_slots=0, capture_thread=False, **kwargs):
+        if as_yuv and rotation != 0:
+            raise Exception('Rotation is not supported for yuv frames')
         # initialize the camera and stream
         self.is_faked = faker_path is not None
+        self.resolution_no = resolution_no
+        # the faker pictures are recorded in the configured resolution
+        self.faker_resolution_no = resolution_no
         self.framerate = framerate
+        self.as_hsv = as_hsv
+        self.as_yuv = as_yuv
+        self.requested = None
         if self.is_faked:
             print('WARN: using video material from "' + faker_path + '", instead of live footage. '
                                                                      'Please change in config if you want live data')
             self.stream = self.faker_stream_generator(faker_path)
         else:
             # assume we are on a raspberry pi then
-            from picamera.array import PiRGBArray
-            from src.ballandhoop.piHSVArray import PiHSVArray
             from picamera import PiCamera
 
             self.camera = PiCamera(sensor_mode=7)
-            self.camera.resolution = resolution
-            self.camera.framerate = framerate
 
             if type(wb_gains) is tuple or type(wb_gains) is list:
                 self.camera.awb_mode = 'off'
                 self.camera.awb_gains = wb_gains
 
-            if as_hsv:
-                self.rawCapture = PiHSVArray(self.camera, size=resolution)
-            else:
-                self.rawCapture = PiRGBArray(self.camera, size=resolution)
-            self.stream = self.camera.capture_continuous(self.rawCapture,
-                                                         format='bgr',  # this is also needed for hsv
-                                                         use_video_port=True)
+            self.open_camera_stream()
 
         # initialize the frame and the variable used to indicate
         # if the thread should be stopped
         self.raw_frame = None
         self.rotation = rotation
         self.fps = FPS()
+        self.ring_slots = int(ring_slots)
+        self.ring = None
+        self.rings = {}
+        self.slot = None
+        if self.ring_slots > 0:
+            # the ring itself is created with the first frame, but probably after the thread-workers are started
+            FrameRing.prepare()
+        self.timestamp = None
+        self.sequence = 0
+        self.overwritten = 0
+        self.capture_thread = bool(capture_thread)
+        self.thread = None
+        # guards the newest frame of the capture thread
+        self.condition = threading.Condition()
+        self.latest = None
+        self.stopped = False
 
     def __iter__(self):
         """
@@ -80,37 +115,190 @@ class VideoStream:
         :meta public:
         """
         self.fps.start()
+        if self.capture_thread and self.thread is None:
+            self.thread = threading.Thread(target=self.capture, name='capture', daemon=True)
+            self.thread.start()
         return self
 
+    def open_camera_stream(self):
+        """
+        Sets the resolution and framerate of the camera and starts its continuous capture
+        """
+        from picamera.array import PiRGBArray
+        from src.ballandhoop.piHSVArray import PiHSVArray
+        from src.ballandhoop.piYUVArray import PiYUVArray
+
+        resolution = self.resolutions[self.resolution_no]
+        self.camera.resolution = resolution
+        self.camera.framerate = self.framerate
+        if self.as_yuv:
+            self.rawCapture = PiYUVArray(self.camera, size=resolution)
+            self.stream = self.camera.capture_continuous(self.rawCapture, format='yuv', use_video_port=True)
+        else:
+            if self.as_hsv:
+                self.rawCapture = PiHSVArray(self.camera, size=resolution)
+            else:
+                self.rawCapture = PiRGBArray(self.camera, size=resolution)
+            self.stream = self.camera.capture_continuous(self.rawCapture,
+                                                         format='bgr',  # this is also needed for hsv
+                                                         use_video_port=True)
+
+    def reconfigure(self, resolution_no: int = None, framerate: int = None):
+        """
+        Asks for another resolution and framerate while running. It is applied by the capturing thread before its
+        next frame, so the frames change their shape some frames later. The camera capture is restarted for it,
+        the faker pictures are resized instead.
+
+        :param resolution_no: the new resolution number, unchanged if None
+        :param framerate: the new framerate, unchanged if None
+        """
+        with self.condition:
+            self.requested = (self.resolution_no if resolution_no is None else resolution_no,
+                              self.framerate if framerate is None else framerate)
+
+    def apply_requested(self):
+        """
+        Applies the resolution and framerate asked for by :py:meth:`reconfigure()`, if any
+        """
+        with self.condition:
+            requested, self.requested = self.requested, None
+        if requested is None or requested == (self.resolution_no, self.framerate):
+            return
+        self.resolution_no, self.framerate = requested
+        if not self.is_faked:
+            self.stream.close()
+            self.rawCapture.close()
+            self.open_camera_stream()
+
     def __next__(self):
         """
         Automatically called to get the next frame e.g. in a for loop with this class as iterator
-        Can rotate the image before returning. Updates the fps counter
+        Can rotate the image before returning. Updates the fps counter.
+        With the capture thread it waits for the next frame the thread delivers.
 
         :return: frame array
         """
+        if self.thread is not None:
+            with self.condition:
+                while self.latest is None and not self.stopped:
+                    self.condition.wait()
+                if self.latest is None:
+                    raise StopIteration
+                f, self.ring, self.slot, self.timestamp, self.sequence = self.latest
+                self.latest = None
+            return f
+        f, self.ring, self.slot, self.timestamp = self.grab()
+        self.sequence += 1
+        return f
+
+    def grab(self):
+        """
+        Reads the next frame from the camera, copies (and rotates) it
+
+        :return: the frame array, its ring and slot (None without a ring) and the capture time
+        :raises StopIteration: if the stream ended
+        """
+        if self.requested is not None:
+            self.apply_requested()
         f = next(self.stream)
+        timestamp = time.time()
         if not self.is_faked:
             # reset pointer to first place (just to be sure)
             self.rawCapture.seek(0)
-            # copy frame
-            f = f.array.copy()
+            f = f.array
+        self.fps.update()
+        ring, slot = None, None
+        if self.ring_slots > 0:
+            # copy (and rotate) the frame directly into the shared memory
+            f, ring, slot = self.to_ring(f)
+        else:
+            if not self.is_faked:
+                # copy frame
+                f = f.copy()
+            # rotate frame if wanted
+            if self.rotation != 0:
+                f = cv2.rotate(f, self.rotations[self.rotation])
+        if not self.is_faked:
             # reset pointer to first place (this usually should have been enough)
             self.rawCapture.seek(0)
             # delete content of frame
             self.rawCapture.truncate(0)
-        self.fps.update()
-        # rotate frame if wanted
-        if self.rotation != 0:
-            f = cv2.rotate(f, self.rotations[self.rotation])
         # return frame
-        return f
+        return f, ring, slot, timestamp
+
+    def capture(self):
+        """
+        The loop of the capture thread: grabs the frames all the time and keeps only the newest one.
+        The faker pictures are delivered at the framerate, like a camera would.
+        """
+        next_time = time.time()
+        sequence = 0
+        try:
+            while not self.stopped:
+                if self.is_faked:
+                    # the framerate may be changed while running
+                    next_time += 1 / self.framerate
+                    time.sleep(max(next_time - time.time(), 0))
+                f, ring, slot, timestamp = self.grab()
+                sequence += 1
+                with self.condition:
+                    old, self.latest = self.latest, (f, ring, slot, timestamp, sequence)
+                    if old is not None:
+                        self.overwritten += 1
+                    self.condition.notify()
+                if old is not None and old[1] is not None:
+                    # nobody took the old frame, so its slot is free again
+                    old[1].release(old[2])
+        except StopIteration:
+            pass
+        finally:
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+
+    def to_ring(self, f):
+        """
+        Writes the frame into a free slot of a ring, rotated if wanted. Waits if there is no free slot.
+        The ring is created with the first frame of its shape, so its slots have the shape of the delivered frames.
+        After a :py:meth:`reconfigure()` the frames go into another ring, the frames in work keep their slots in the
+        old one.
+
+        :param f: the frame array as delivered by the camera
+        :return: the frame array inside the slot, the ring and the index of the slot
+        :raises StopIteration: if the stream is closed while waiting for a free slot
+        """
+        shape = f.shape
+        if self.rotation in (1, 3):
+            shape = (shape[1], shape[0]) + shape[2:]
+        ring = self.rings.get(shape)
+        if ring is None:
+            ring = self.rings[shape] = FrameRing(shape, f.dtype, self.ring_slots)
+        slot = None
+        while slot is None:
+            try:
+                slot = ring.acquire(timeout=0.1)
+            except queue.Empty:
+                if self.stopped:
+                    raise StopIteration
+        dst = ring.frame(slot)
+        if self.rotation != 0:
+            cv2.rotate(f, self.rotations[self.rotation], dst=dst)
+        else:
+            np.copyto(dst, f)
+        return dst, ring, slot
 
     def close(self):
         """
-        Stops the FPS counter and closes the resources if needed
+        Stops the FPS counter and the capture thread and closes the resources if needed
         """
         self.fps.stop()
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        for ring in self.rings.values():
+            ring.close()
         if not self.is_faked:
             self.stream.close()
             self.rawCapture.close()
@@ -119,12 +307,25 @@ class VideoStream:
     def faker_stream_generator(self, faker_path):
         """
         Takes the faker path from the config and delivers the png pictures there as the videostream. Good for debugging
-        to get a reliable input
+        to get a reliable input. The pictures are converted to YUV420 if :py:attr:`as_yuv` is set,
+        to HSV if :py:attr:`as_hsv` is set. They are recorded in the configured resolution, after a
+        :py:meth:`reconfigure()` they are resized like the camera would deliver them.
         """
 
         idx = 1  # 0th pic is sometimes weird
         file = faker_path + "/" + str(idx) + ".png"
         while os.path.isfile(file):
-            yield cv2.cvtColor(cv2.imread(file), cv2.COLOR_BGR2HSV)
+            img = cv2.imread(file)
+            if self.resolution_no != self.faker_resolution_no:
+                width, height = self.resolutions[self.resolution_no]
+                faker_width, faker_height = self.resolutions[self.faker_resolution_no]
+                img = cv2.resize(img, (round(img.shape[1] * width / faker_width),
+                                       round(img.shape[0] * height / faker_height)), interpolation=cv2.INTER_AREA)
+            if self.as_yuv:
+                yield cv2.cvtColor(img, cv2.COLOR_BGR2YUV_I420)
+            elif self.as_hsv:
+                yield cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            else:
+                yield img
             idx = idx + 1
             file = faker_path + "/" + str(idx) + ".png"
@@ -1,7 +1,13 @@
+from __future__ import annotations
+
+import asyncio
 import select
+import struct
 import threading
 import socket
 import datetime
+import time
+from collections import deque
 from threading import Thread
 
 import scipy.io
@@ -9,6 +15,146 @@ import yaml
 
 from src.serial import SerialCom
 
+PROTOCOL_VERSION = 1
+"""
+The version of the wire protocol, a message of another version is refused
+"""
+
+HELLO = 1
+"""
+The message type of the first message of a client, its payload is the hostname
+"""
+VALUE = 2
+"""
+The message type of an angle or error code of a frame
+"""
+ACK = 3
+"""
+The message type of the answer of the server to each message, with the sequence of the confirmed message
+"""
+
+HEADER = struct.Struct('!H')
+"""
+The length prefix of each message: the amount of bytes which follow
+"""
+RECORD = struct.Struct('!BBIdI')
+"""
+The fixed record of each message: version, message type, frame sequence, capture timestamp and the angle or error
+code. Only a hello message has a payload after the record.
+"""
+
+
+def pack_message(message_type: int, sequence: int = 0, timestamp: float = 0.0, value: int = 0,
+                 payload: bytes = b'') -> bytes:
+    """
+    :param message_type: one of :py:data:`HELLO`, :py:data:`VALUE` or :py:data:`ACK`
+    :param sequence: the frame sequence
+    :param timestamp: the capture time of the frame
+    :param value: the angle or error code
+    :param payload: the bytes after the record
+    :return: the message with its length prefix
+    """
+    return (HEADER.pack(RECORD.size + len(payload)) +
+            RECORD.pack(PROTOCOL_VERSION, message_type, sequence, timestamp, value) + payload)
+
+
+def unpack_message(buffer, offset: int, length: int) -> tuple:
+    """
+    Unpacks a message from the buffer, without copying the record
+
+    :param buffer: the buffer the message is in
+    :param offset: the start of the record, behind the length prefix
+    :param length: the length of the message
+    :return: the message type, sequence, timestamp, value and payload
+    :rtype: tuple[int, int, float, int, bytes]
+    """
+    version, message_type, sequence, timestamp, value = RECORD.unpack_from(buffer, offset)
+    if version != PROTOCOL_VERSION:
+        raise Exception('Unsupported protocol version ' + str(version) + ', expected ' + str(PROTOCOL_VERSION))
+    payload = b''
+    if length > RECORD.size:
+        payload = bytes(buffer[offset + RECORD.size:offset + length])
+    return message_type, sequence, timestamp, value, payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    """
+    Reads the next message from a stream of the event loop
+
+    :param reader: the incoming stream
+    :return: the message, see :py:func:`unpack_message()`
+    :raises asyncio.IncompleteReadError: if the connection is closed
+    """
+    length, = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length < RECORD.size:
+        raise Exception('Invalid message length ' + str(length))
+    return unpack_message(await reader.readexactly(length), 0, length)
+
+
+class MessageReader:
+    """
+    Splits the byte stream of a connection into messages. The bytes are received with `recv_into` straight into a
+    preallocated buffer and the records are unpacked from there. So a message which arrives in two segments, or two
+    messages in one segment, are still read correctly.
+
+    :param size: the size of the buffer, the longest message has to fit in
+
+    :ivar start: the begin of the first incomplete message in the buffer
+    :ivar end: the end of the received bytes in the buffer
+    :ivar pending: the complete messages which were not taken by :py:meth:`read()` yet
+    """
+
+    def __init__(self, size: int = 4096):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.pending = deque()
+
+    def recv(self, s: socket.socket) -> list | None:
+        """
+        Receives once from the socket, does not block if the socket is readable
+
+        :param s: the socket
+        :return: the messages which are complete now, see :py:func:`unpack_message()`, None if the connection closed
+        """
+        if self.end == len(self.buffer):
+            # move the incomplete message to the front, to make space
+            rest = self.end - self.start
+            self.buffer[:rest] = bytes(self.view[self.start:self.end])
+            self.start, self.end = 0, rest
+        received = s.recv_into(self.view[self.end:])
+        if received == 0:
+            return None
+        self.end += received
+        messages = []
+        while self.end - self.start >= HEADER.size:
+            length, = HEADER.unpack_from(self.buffer, self.start)
+            if length < RECORD.size or HEADER.size + length > len(self.buffer):
+                raise Exception('Invalid message length ' + str(length))
+            if self.end - self.start < HEADER.size + length:
+                break
+            messages.append(unpack_message(self.view, self.start + HEADER.size, length))
+            self.start += HEADER.size + length
+        if self.start == self.end:
+            self.start = self.end = 0
+        return messages
+
+    def read(self, s: socket.socket) -> tuple:
+        """
+        Waits for the next message on a blocking socket
+
+        :param s: the socket
+        :return: the message, see :py:func:`unpack_message()`
+        :raises ConnectionResetError: if the connection closed
+        """
+        while not self.pending:
+            messages = self.recv(s)
+            if messages is None:
+                raise ConnectionResetError('Connection closed')
+            self.pending.extend(messages)
+        return self.pending.popleft()
+
 
 class NetworkInterface:
     """
@@ -25,6 +171,7 @@ class NetworkInterface:
     :ivar WRONG_ORDER: max_precision - 2, an error code for a failed race condition
     :ivar ERROR: max_precision - 3, an error code, for a general error
     :ivar LOST_CONNECTION: max_precision - 4, an error code, for a lost camera-pi
+    :ivar record_latency: if set, called with the name and the seconds of the slow steps of a send, e.g. 'serial'
     """
 
     def __init__(self, send_errors: bool = True, precision: int = 360, message_bytes: int = 2, **kwargs):
@@ -37,11 +184,14 @@ class NetworkInterface:
         self.max_precision = 2 ** (8 * message_bytes)
         if precision + 10 > self.max_precision:
             raise ArithmeticError('Not enough message_bytes to fulfill precision')
+        if message_bytes > 4:
+            raise ArithmeticError('The network record holds at most 4 message_bytes')
 
         self.NOT_FOUND = self.max_precision - 1
         self.WRONG_ORDER = self.max_precision - 2
         self.ERROR = self.max_precision - 3
         self.LOST_CONNECTION = self.max_precision - 4
+        self.record_latency = None
 
     def preprocess_message(self, data: float) -> (int, bool):
         """
@@ -62,11 +212,24 @@ class NetworkInterface:
         # shift negative values
         return int((data + self.precision) % self.precision), False
 
-    def send(self, val):
+    def send(self, val, sequence: int = 0, timestamp: float = 0.0):
         """
         A placeholder which will be overwritten by its parents
 
         :param val: the data
+        :param sequence: the number of the frame the data belongs to
+        :param timestamp: the capture time of the frame
+        """
+        raise Exception('Has to be overwritten by child class')
+
+    async def send_async(self, val, sequence: int = 0, timestamp: float = 0.0):
+        """
+        The same as :py:meth:`send()`, but for the :py:class:`~.asyncRuntime.AsyncRuntime`: it waits without blocking
+        the event loop. Only available inside `async with`.
+
+        :param val: the data
+        :param sequence: the number of the frame the data belongs to
+        :param timestamp: the capture time of the frame
         """
         raise Exception('Has to be overwritten by child class')
 
@@ -74,18 +237,24 @@ class NetworkInterface:
 class Server(Thread, NetworkInterface):
     """
     The server class. Manages the incoming connections from clients, pipes data to the serial port and is logging
-    the values for a later plotting usage
+    the values for a later plotting usage. The clients send binary messages, see :py:func:`pack_message()`, the server
+    confirms each one with an :py:data:`ACK`.
+    With `with` it runs in a thread of its own, with `async with` it runs in the event loop instead: each client
+    connection is a task and the serial port is written by a task, which takes the values from a bounded queue.
 
     :param server_ip: the ip of the server (has to be localhost)
     :param server_port: the port we are waiting for connections
     :param serial: the configuration for the serial class
     :param print_debug: a flag if debug output should be printed or discarded
+    :param serial_queue: only in the event loop: the amount of values waiting for the serial port, if it falls
+        behind the oldest value is dropped
     :param kwargs: a catch-all parameter for additional config given
 
     :ivar serial: A object of the :py:class:`SerialCom`
+    :ivar serial_dropped: the amount of values which were dropped, because the serial port fell behind
     """
 
-    def __init__(self, server_ip, server_port, serial, print_debug=False, **kwargs):
+    def __init__(self, server_ip, server_port, serial, print_debug=False, serial_queue: int = 4, **kwargs):
         NetworkInterface.__init__(self, **kwargs)
         Thread.__init__(self, daemon=True)  # init Thread, deamon=True: kill it if parent tread is killed
         self.server_ip = server_ip
@@ -93,12 +262,19 @@ class Server(Thread, NetworkInterface):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sockets = []
+        self.readers = {}
         self.interrupt = threading.Event()
         self.write_value_lock = threading.Lock()
         self.print_debug = print_debug
         self.serial = SerialCom(verbose=print_debug, message_bytes=self.message_bytes, **serial)
         self.values = {}
         self.host_map = {'local': socket.gethostname()}
+        self.serial_queue_size = int(serial_queue)
+        self.serial_queue = None
+        self.serial_task = None
+        self.serial_dropped = 0
+        self.async_server = None
+        self.writers = set()
         print('Init Server')
 
     def __enter__(self):
@@ -115,11 +291,87 @@ class Server(Thread, NetworkInterface):
         self.start()
         return self
 
+    async def __aenter__(self):
+        """
+        Starts the network server and the serial task in the running event loop, instead of a thread
+
+        :return: self
+        :rtype: NetworkInterface
+        """
+        self.server.__enter__()
+        self.server.bind((self.server_ip, self.server_port))
+        self.server.listen(2)
+        self.async_server = await asyncio.start_server(self.handle_client, sock=self.server)
+        self.serial_queue = asyncio.Queue(maxsize=self.serial_queue_size)
+        self.serial_task = asyncio.create_task(self.write_serial(), name='serial')
+        self.print('Server is running')
+        return self
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        The task of a client connection in the event loop, same protocol as :py:meth:`run()`
+
+        :param reader: the incoming stream of the client
+        :param writer: the outgoing stream of the client
+        """
+        address = addr(writer.get_extra_info('socket'))
+        print("Connection from: " + str(writer.get_extra_info('peername')))
+        self.writers.add(writer)
+        try:
+            while True:
+                message = await read_message(reader)
+                self.receive(message, address)
+                # answer for each message, message confirmed
+                writer.write(pack_message(ACK, message[1]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print('Closing connection ' + address + ': ' + str(e))
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def write_serial(self):
+        """
+        The serial task in the event loop: writes the queued values to the serial port, the blocking write itself
+        runs in a thread
+        """
+        while True:
+            val = await self.serial_queue.get()
+            try:
+                start_time = time.perf_counter()
+                await asyncio.to_thread(self.serial.write, val)
+                if self.record_latency is not None:
+                    self.record_latency('serial', time.perf_counter() - start_time)
+            finally:
+                self.serial_queue.task_done()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Closes the server in the event loop, the queued values are still written to the serial port for a second
+        """
+        self.print('Closing Server')
+        try:
+            await asyncio.wait_for(self.serial_queue.join(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        self.serial_task.cancel()
+        for writer in list(self.writers):
+            writer.close()
+        self.async_server.close()
+        await asyncio.gather(self.serial_task, self.async_server.wait_closed(), return_exceptions=True)
+        if self.serial_dropped:
+            print('The serial port fell behind, dropped ' + str(self.serial_dropped) + ' values')
+        self.interrupt.set()
+        self.stop()
+
     def run(self) -> None:
         """
         Runs the network server. This method is started in a separate thread
         It iterates through all connection sockets, including the server, watching for new data or connections.
-        The first given data is the hostname, so a reconnect with the same hostname is possible server vice
+        The first message is a :py:data:`HELLO` with the hostname, so a reconnect with the same hostname is possible
+        server vice
 
         """
         self.print('Server is running')
@@ -137,24 +389,25 @@ class Server(Thread, NetworkInterface):
                         client_socket, address = self.server.accept()
                         client_socket.__enter__()
                         self.sockets.append(client_socket)
+                        self.readers[client_socket] = MessageReader()
                         print("Connection from: " + str(address))
                     else:
                         # s is a client socket, so there is data
-                        data = s.recv(1024)
-                        if data:
-                            if addr(s) not in self.host_map:
-                                # first data sent is his hostname - save for remapping the connection
-                                self.host_map[addr(s)] = data.decode()
-                            else:
-                                # save values for later
-                                data, is_error = self.preprocess_message(int(data.decode()))
-                                self.save_values(data, addr(s), is_error=is_error)
-                            # self.print(str(addr(s)) + ":" + str(float(data)))
-                            # generic answer for each client, message confirmed
-                            s.sendall('ok'.encode())
-                        else:
+                        try:
+                            messages = self.readers[s].recv(s)
+                            for message in messages or []:
+                                self.receive(message, addr(s))
+                                # answer for each message, message confirmed
+                                s.sendall(pack_message(ACK, message[1]))
+                        except ConnectionError:
+                            messages = None
+                        except Exception as e:
+                            print('Closing connection ' + addr(s) + ': ' + str(e))
+                            messages = None
+                        if messages is None:
                             s.close()
                             self.sockets.remove(s)
+                            del self.readers[s]
         except SystemExit:
             pass
         except KeyboardInterrupt:
@@ -162,6 +415,26 @@ class Server(Thread, NetworkInterface):
         finally:
             self.stop()
 
+    def receive(self, message: tuple, address: str):
+        """
+        Handles a message of a client: the first one is a hello with his hostname, the following are values
+
+        :param message: the message, see :py:func:`unpack_message()`
+        :param address: connection address, see :py:func:`addr()`
+        """
+        message_type, sequence, timestamp, value, payload = message
+        if message_type == HELLO:
+            # save the hostname for remapping the connection
+            self.host_map[address] = payload.decode()
+        elif message_type == VALUE:
+            if address not in self.host_map:
+                raise Exception('Value before hello')
+            # save values for later
+            data, is_error = self.preprocess_message(value)
+            self.save_values(data, address, is_error=is_error, sequence=sequence, captured=timestamp)
+        else:
+            raise Exception('Unexpected message type ' + str(message_type))
+
     def stop(self):
         """
         Saves the data which was sent in a result.mat and result.yml file
@@ -188,7 +461,7 @@ class Server(Thread, NetworkInterface):
         for s in self.sockets:
             s.close()
 
-    def save_values(self, data, address, is_error: bool):
+    def save_values(self, data, address, is_error: bool, sequence: int = 0, captured: float = 0.0):
         """
         Saves the value (or error) in an value array, together with the time.
         The hostname is used as a a top level key.
@@ -196,13 +469,17 @@ class Server(Thread, NetworkInterface):
         :param data: the data
         :param address: connection address, where the hostname can be deducted from
         :param is_error: a flag if this data is an error code, so we do nat have to check here
+        :param sequence: the number of the frame on its host
+        :param captured: the capture time of the frame on its host
         :return:
         """
         hostname = self.host_map[address]
         with self.write_value_lock:
             if hostname not in self.values:
-                self.values[hostname] = {'time': [], 'angle': [], 'error': []}
+                self.values[hostname] = {'time': [], 'angle': [], 'error': [], 'sequence': [], 'captured': []}
             self.values[hostname]['time'].append(now())
+            self.values[hostname]['sequence'].append(sequence)
+            self.values[hostname]['captured'].append(captured)
             if is_error:
                 self.values[hostname]['error'].append(data - self.max_precision + 10)
                 prev_val = 0
@@ -227,7 +504,7 @@ class Server(Thread, NetworkInterface):
                 ret[host] = {'time': v['time'][-1], 'angle': v['angle'][-1], 'error': v['angle'][-1]}
             return ret
 
-    def send(self, val):
+    def send(self, val, sequence: int = 0, timestamp: float = 0.0):
         """
         does not send the data to the server, because this is the server already.
         So it justs saves the data and pipes the data through to the serial interface.
@@ -235,16 +512,39 @@ class Server(Thread, NetworkInterface):
         from all 3 values, you need to change this method
 
         :param val:
+        :param sequence: the number of the frame
+        :param timestamp: the capture time of the frame
         :return:
         """
         val, is_error = self.preprocess_message(val)
         if not is_error or (is_error and self.send_errors):
             # save value history for later
-            self.save_values(val, 'local', is_error=is_error)
+            self.save_values(val, 'local', is_error=is_error, sequence=sequence, captured=timestamp)
             # vals = self.latest_values() # get latest values
             # use them somehow to calc a better val variable to send
             # send to serial
+            start_time = time.perf_counter()
             self.serial.write(val)
+            if self.record_latency is not None:
+                self.record_latency('serial', time.perf_counter() - start_time)
+
+    async def send_async(self, val, sequence: int = 0, timestamp: float = 0.0):
+        """
+        Same as :py:meth:`send()`, but the value is queued for the serial task. If the serial port fell behind, the
+        oldest queued value is dropped.
+
+        :param val: the angle or the error
+        :param sequence: the number of the frame
+        :param timestamp: the capture time of the frame
+        """
+        val, is_error = self.preprocess_message(val)
+        if not is_error or (is_error and self.send_errors):
+            self.save_values(val, 'local', is_error=is_error, sequence=sequence, captured=timestamp)
+            if self.serial_queue.full():
+                self.serial_queue.get_nowait()
+                self.serial_queue.task_done()
+                self.serial_dropped += 1
+            self.serial_queue.put_nowait(val)
 
     def print(self, msg):
         """ Helper method which suppresses debug output if not configured """
@@ -258,8 +558,19 @@ class Client(NetworkInterface):
         self.socket.__enter__()
         try:
             self.socket.connect((self.server_ip, self.server_port))
-            self.socket.sendall(str(socket.gethostname()).encode())
-            if self.socket.recv(1024) == b'ok':
+            self.socket.sendall(pack_message(HELLO, payload=socket.gethostname().encode()))
+            if self.messages.read(self.socket)[0] == ACK:
+                return self
+        except ConnectionRefusedError:
+            print("Connection to server refused. Not yet running on this port/ip?")
+            exit(1)
+
+    async def __aenter__(self):
+        try:
+            self.reader, self.writer = await asyncio.open_connection(self.server_ip, self.server_port)
+            self.writer.write(pack_message(HELLO, payload=socket.gethostname().encode()))
+            await self.writer.drain()
+            if (await read_message(self.reader))[0] == ACK:
                 return self
         except ConnectionRefusedError:
             print("Connection to server refused. Not yet running on this port/ip?")
@@ -268,7 +579,8 @@ class Client(NetworkInterface):
     def __init__(self, server_ip, server_port, **kwargs):
         """
         Uses the :py:class:`network.NetworkInterface` and overrides the send method placeholder.
-        Sends its angle data to the server on arrival via :py:meth:`send()`
+        Sends its angle data to the server on arrival via :py:meth:`send()`, as binary messages,
+        see :py:func:`pack_message()`.
         Is initialized via :py:meth:`network.init_network()` Method and with config variables.
 
         """
@@ -277,27 +589,63 @@ class Client(NetworkInterface):
         self.server_port = server_port
         print('Connecting to: ' + str(self.server_ip) + ':' + str(self.server_port))
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.messages = MessageReader()
+        self.reader = None
+        self.writer = None
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.socket.__exit__(exc_type, exc_val, exc_tb)
 
-    def send(self, val):
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.socket.close()
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def send(self, val, sequence: int = 0, timestamp: float = 0.0):
         """
         Sends the data to the server
 
         :param val: the angle or the error
-        :return:
+        :param sequence: the number of the frame
+        :param timestamp: the capture time of the frame
+        :return: flag if the server confirmed the data
         """
         try:
             val, is_error = self.preprocess_message(val)
             if not is_error or (is_error and self.send_errors):
-                self.socket.sendall(str(val).encode())
-                return self.socket.recv(1024) == b'ok'
+                self.socket.sendall(pack_message(VALUE, sequence, timestamp, val))
+                message_type, confirmed, _, _, _ = self.messages.read(self.socket)
+                return message_type == ACK and confirmed == sequence
             return False
         except ConnectionResetError:
             print('Server wurde beendet')
             exit(1)
 
+    async def send_async(self, val, sequence: int = 0, timestamp: float = 0.0):
+        """
+        Sends the data to the server, waits for the answer without blocking the event loop
+
+        :param val: the angle or the error
+        :param sequence: the number of the frame
+        :param timestamp: the capture time of the frame
+        :return: flag if the server confirmed the data
+        """
+        try:
+            val, is_error = self.preprocess_message(val)
+            if not is_error or (is_error and self.send_errors):
+                self.writer.write(pack_message(VALUE, sequence, timestamp, val))
+                await self.writer.drain()
+                message_type, confirmed, _, _, _ = await read_message(self.reader)
+                return message_type == ACK and confirmed == sequence
+            return False
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            print('Server wurde beendet')
+            exit(1)
+
 
 def init_network(is_server: bool, server_ip: str, server_port: int = 9999, **kwargs) -> NetworkInterface:
     """
@@ -0,0 +1,108 @@
+# compares the runtime and the results of the detector variants on recorded faker material
+import argparse
+import os
+import socket
+import time
+
+import cv2
+import numpy
+import yaml
+from tabulate import tabulate
+import repackage
+repackage.up()
+from src.ballandhoop.detectors import create_detector
+from src.ballandhoop.hoop import Hoop
+
+ap = argparse.ArgumentParser()
+# ---------------------------------------------------
+ap.add_argument("-p", "--path", type=str, default=None,
+                help="The faker directory with the recorded pngs, defaults to camera.faker_path of the host config")
+ap.add_argument("--host", type=str, default=socket.gethostname(),
+                help="The host whose hoop and ball config is used")
+ap.add_argument("-r", "--runs", type=int, default=5, help="How often all frames are searched per variant")
+ap.add_argument("-n", "--noise", type=int, default=0,
+                help="Adds uniform noise of +- this amount to each channel, the angles are compared to the contours "
+                     "search on the frames without noise")
+# ---------------------------------------------------
+args = vars(ap.parse_args())
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+with open(os.path.join(root, 'config.yml')) as cfg_file:
+    cfg = yaml.load(cfg_file, Loader=yaml.Loader)[args['host']]
+path = args['path'] or os.path.join(root, cfg['camera']['faker_path'])
+
+frames_bgr = []
+idx = 1  # 0th pic is sometimes weird, see VideoStream.faker_stream_generator()
+while os.path.isfile(os.path.join(path, str(idx) + '.png')):
+    frames_bgr.append(cv2.imread(os.path.join(path, str(idx) + '.png')))
+    idx = idx + 1
+if len(frames_bgr) == 0:
+    print('No frames found in ' + path)
+    exit(1)
+clean_bgr = frames_bgr
+if args['noise'] > 0:
+    rng = numpy.random.default_rng(0)
+    noisy = [f.astype(numpy.int16) + rng.integers(-args['noise'], args['noise'] + 1, f.shape) for f in frames_bgr]
+    frames_bgr = [numpy.clip(f, 0, 255).astype(numpy.uint8) for f in noisy]
+# the frames in the format the camera delivers them, the hsv conversion is part of the measured time,
+# because the PiHSVArray has to do it for each frame as well
+frames = {
+    'hsv': frames_bgr,
+    'bgr': frames_bgr,
+    'yuv': [cv2.cvtColor(f, cv2.COLOR_BGR2YUV_I420) for f in frames_bgr],
+}
+conversions = {
+    'hsv': lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2HSV),
+    'bgr': lambda f: f,
+    'yuv': lambda f: f,
+}
+
+# name: (frame color space, additional ball config)
+variants = {
+    'contours': ('hsv', {'detector': 'contours'}),
+    'components': ('hsv', {'detector': 'components'}),
+    'anglemap': ('hsv', {'detector': 'anglemap'}),
+    'polar': ('hsv', {'detector': 'polar'}),
+    'background': ('hsv', {'detector': 'background'}),
+    'pyramid 1': ('hsv', {'pyramid_levels': 1}),
+    'pyramid 2': ('hsv', {'pyramid_levels': 2}),
+    'pyramid 3': ('hsv', {'pyramid_levels': 3}),
+    'color table': ('bgr', {'color_table': True}),
+    'yuv': ('yuv', {'yuv': True}),
+}
+
+# the keys which select the detector variant are removed from the host config
+variant_keys = ('detector', 'color_table', 'yuv', 'pyramid_levels')
+base_config = {k: v for k, v in cfg['ball'].items() if k not in variant_keys}
+hoop = Hoop(**cfg['hoop'])
+# the reference is the contours search on the frames without noise
+reference_detector = create_detector(hoop, dict(base_config, detector='contours'), clean_bgr[0].shape)
+reference = numpy.array([numpy.nan if b is None else b.angle() for b in
+                         (reference_detector.detect(conversions['hsv'](f)) for f in clean_bgr)])
+table = {'variant': [], 'ms/frame': [], 'found': [], 'mean angle diff': [], 'max angle diff': [],
+         'mean confidence': []}
+for name, (color_space, ball_config) in variants.items():
+    ball_config = dict(base_config, **ball_config)
+    # all variants go through the same engine surface, the precomputation is done in the constructor
+    detector = create_detector(hoop, ball_config, frames[color_space][0].shape)
+    convert = conversions[color_space]
+    # warm up, so the caches are filled
+    balls = [detector.detect(convert(f)) for f in frames[color_space]]
+    start_time = time.perf_counter()
+    for _ in range(args['runs']):
+        for f in frames[color_space]:
+            detector.detect(convert(f))
+    ms = (time.perf_counter() - start_time) / args['runs'] / len(frames_bgr) * 1000
+    angles = numpy.array([numpy.nan if b is None else b.angle() for b in balls])
+    diffs = numpy.abs((angles - reference + 180) % 360 - 180)
+    table['variant'].append(name)
+    table['ms/frame'].append(round(ms, 3))
+    table['found'].append(str(int(numpy.sum(~numpy.isnan(angles)))) + '/' + str(len(angles)))
+    table['mean angle diff'].append(numpy.nanmean(diffs) if numpy.any(~numpy.isnan(diffs)) else numpy.nan)
+    table['max angle diff'].append(numpy.nanmax(diffs) if numpy.any(~numpy.isnan(diffs)) else numpy.nan)
+    confidences = [b.confidence for b in balls if b is not None and b.confidence is not None]
+    table['mean confidence'].append(numpy.mean(confidences) if confidences else numpy.nan)
+
+print(str(len(frames_bgr)) + ' frames from ' + path + ' with noise +-' + str(args['noise']) +
+      ', angle differences compared to contours without noise')
+print(tabulate(table, headers='keys'))
@@ -0,0 +1,68 @@
+# compares sending the frames pickled to the thread-workers with sending only a slot index of a shared memory ring
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy
+from tabulate import tabulate
+import repackage
+repackage.up()
+from src.ballandhoop.frameRing import FrameRing
+from src.ballandhoop.videostream import VideoStream
+
+ap = argparse.ArgumentParser()
+# ---------------------------------------------------
+ap.add_argument("-f", "--frames", type=int, default=600, help="The amount of frames sent per resolution and mode")
+ap.add_argument("-s", "--slots", type=int, default=16, help="The amount of slots of the ring")
+ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="The amount of thread-workers")
+# ---------------------------------------------------
+args = vars(ap.parse_args())
+
+
+def work_pickled(frame_number, frame):
+    # the worker only touches the frame, so only the dispatch is measured
+    return frame_number, int(frame[0, 0, 0])
+
+
+def work_slot(ring, slot, frame_number):
+    return frame_number, int(ring.frame(slot)[0, 0, 0])
+
+
+def run(pool, frames, ring=None):
+    results = []
+    start_time = time.perf_counter()
+    for i in range(args['frames']):
+        frame = frames[i % len(frames)]
+        if ring is None:
+            results.append(pool.apply_async(work_pickled, args=(i, frame)))
+        else:
+            # like the VideoStream, the frame is copied into the next free slot
+            slot = ring.acquire()
+            numpy.copyto(ring.frame(slot), frame)
+            results.append(pool.apply_async(work_slot, args=(ring, slot, i),
+                                            callback=lambda _, s=slot: ring.release(s)))
+    for r in results:
+        r.get()
+    return (time.perf_counter() - start_time) / args['frames'] * 1000
+
+
+if __name__ == '__main__':
+    # the tracker has to run before the workers are forked, see FrameRing.prepare()
+    FrameRing.prepare()
+    pool = multiprocessing.Pool(processes=args['workers'])
+    table = {'resolution': [], 'frame KB': [], 'pickled ms/frame': [], 'shared memory ms/frame': []}
+    for resolution_no, (width, height) in VideoStream.resolutions.items():
+        frames = [numpy.random.randint(0, 255, (height, width, 3), dtype=numpy.uint8) for _ in range(4)]
+        ring = FrameRing(frames[0].shape, frames[0].dtype, args['slots'])
+        # warm up, so the workers are attached to the ring
+        run(pool, frames, ring)
+        table['resolution'].append(str(resolution_no) + ': ' + str(width) + 'x' + str(height))
+        table['frame KB'].append(frames[0].nbytes // 1024)
+        table['pickled ms/frame'].append(round(run(pool, frames), 3))
+        table['shared memory ms/frame'].append(round(run(pool, frames, ring), 3))
+        ring.close()
+    pool.terminate()
+    print(str(args['frames']) + ' frames per run with ' + str(args['workers']) + ' workers and ' + str(args['slots']) +
+          ' slots')
+    print(tabulate(table, headers='keys'))
@@ -0,0 +1,122 @@
+# compares the execution modes of the thread-workers (process, thread, inline) on recorded faker material,
+# scaled to each resolution of the VideoStream
+import argparse
+import os
+import socket
+import threading
+import time
+
+import cv2
+import numpy
+import yaml
+from tabulate import tabulate
+import repackage
+repackage.up()
+from src.ballandhoop import poolWorker
+from src.ballandhoop.frameScheduler import FrameScheduler
+from src.ballandhoop.hoop import Hoop
+from src.ballandhoop.qualityController import scale_configs
+from src.ballandhoop.videostream import VideoStream
+
+ap = argparse.ArgumentParser()
+# ---------------------------------------------------
+ap.add_argument("-p", "--path", type=str, default=None,
+                help="The faker directory with the recorded pngs, defaults to camera.faker_path of the host config")
+ap.add_argument("--host", type=str, default=socket.gethostname(),
+                help="The host whose hoop and ball config is used")
+ap.add_argument("-f", "--frames", type=int, default=600, help="The amount of frames sent per resolution and mode")
+ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="The amount of thread-workers")
+ap.add_argument("-m", "--max-in-flight", type=int, default=2, help="The frames per thread-worker in work at once")
+ap.add_argument("-r", "--framerate", type=int, default=60, help="The framerate of the camera for the latency run")
+# ---------------------------------------------------
+args = vars(ap.parse_args())
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+with open(os.path.join(root, 'config.yml')) as cfg_file:
+    cfg = yaml.load(cfg_file, Loader=yaml.Loader)[args['host']]
+path = args['path'] or os.path.join(root, cfg['camera']['faker_path'])
+
+frames_bgr = []
+idx = 1  # 0th pic is sometimes weird, see VideoStream.faker_stream_generator()
+while os.path.isfile(os.path.join(path, str(idx) + '.png')):
+    frames_bgr.append(cv2.imread(os.path.join(path, str(idx) + '.png')))
+    idx = idx + 1
+if len(frames_bgr) == 0:
+    print('No frames found in ' + path)
+    exit(1)
+
+
+def run(mode, frames, hoop_config, ball_config, max_in_flight, framerate=0):
+    """
+    Sends the frames to the thread-workers of the mode
+
+    :param max_in_flight: the frames per thread-worker in work at once, 0 for no limit
+    :param framerate: the frames are sent at this rate like a camera does, as fast as possible if 0
+    :return: the results per second, the dropped frames and the latencies in ms
+    """
+    geometry = poolWorker.shared_geometry(Hoop(**hoop_config))
+    pool = poolWorker.create_pool(mode, args['workers'], initializer=poolWorker.init_worker,
+                                  initargs=(hoop_config, ball_config, geometry))
+    sent = {}
+    latencies = []
+    last = {'frame_number': 0, 'event': threading.Event()}
+
+    def callback(result):
+        latencies.append((time.perf_counter() - sent[result.frame_number]) * 1000)
+        if result.frame_number == last['frame_number']:
+            last['event'].set()
+
+    def on_drop(frame_number):
+        if frame_number == last['frame_number']:
+            last['event'].set()
+
+    scheduler = FrameScheduler(pool, args['workers'], max_in_flight, callback=callback, on_drop=on_drop)
+
+    def send(first, count):
+        last['frame_number'] = first + count - 1
+        last['event'].clear()
+        next_time = time.perf_counter()
+        for i in range(first, first + count):
+            if framerate:
+                next_time += 1 / framerate
+                time.sleep(max(next_time - time.perf_counter(), 0))
+            sent[i] = time.perf_counter()
+            scheduler.submit(i, poolWorker.detect, (i, frames[i % len(frames)]))
+        # the last frame is either waiting for a thread-worker or in work
+        last['event'].wait(timeout=60)
+
+    # warm up, so each thread-worker has prepared its detector
+    send(1, args['workers'] * 8)
+    time.sleep(0.5)
+    latencies.clear()
+    dropped = scheduler.dropped
+    start_time = time.perf_counter()
+    send(len(sent) + 1, args['frames'])
+    duration = time.perf_counter() - start_time
+    pool.terminate()
+    pool.close()
+    return len(latencies) / duration, scheduler.dropped - dropped, latencies
+
+
+if __name__ == '__main__':
+    table = {'resolution': [], 'mode': [], 'max results/s': [], 'dropped': [], 'latency ms p50': [],
+             'latency ms p95': []}
+    for resolution_no, (width, height) in VideoStream.resolutions.items():
+        scale = (width / frames_bgr[0].shape[1], height / frames_bgr[0].shape[0])
+        # the hsv conversion is done by the camera, see PiHSVArray
+        frames = [cv2.cvtColor(cv2.resize(f, (width, height)), cv2.COLOR_BGR2HSV) for f in frames_bgr]
+        hoop_config, ball_config = scale_configs(cfg['hoop'], cfg['ball'], scale)
+        for mode in poolWorker.MODES:
+            # the throughput with all frames at once, the latency at the framerate of the camera
+            results_per_second, _, _ = run(mode, frames, hoop_config, ball_config, 0)
+            _, dropped, latencies = run(mode, frames, hoop_config, ball_config, args['max_in_flight'],
+                                        args['framerate'])
+            table['resolution'].append(str(resolution_no) + ': ' + str(width) + 'x' + str(height))
+            table['mode'].append(mode)
+            table['max results/s'].append(round(results_per_second, 1))
+            table['dropped'].append(dropped)
+            table['latency ms p50'].append(round(numpy.percentile(latencies, 50), 3))
+            table['latency ms p95'].append(round(numpy.percentile(latencies, 95), 3))
+    print(str(args['frames']) + ' frames from ' + path + ' per run with ' + str(args['workers']) + ' workers, ' +
+          str(args['max_in_flight']) + ' frames in flight per worker at ' + str(args['framerate']) + ' fps')
+    print(tabulate(table, headers='keys'))
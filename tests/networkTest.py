@@ -19,7 +19,7 @@ ap.add_argument("-p", "--port", type=int, default=9999, help="The port to listen
 args = vars(ap.parse_args())
 
 if args['server']:
-    with Server(args['server_ip'], args['port']) as server:
+    with Server(args['server_ip'], args['port'], serial={'active': False}) as server:
         try:
             while True:
                 pass
@@ -31,7 +31,7 @@ else:
     with Client(args['server_ip'], args['port']) as c:
         for i in range(1, 10):
             sendTime = datetime.utcnow()
-            answer = c.send(str(sendTime).encode())
+            answer = c.send(i, i, time.time())
             receivedTime = datetime.utcnow()
             diffs.append((receivedTime - sendTime).total_seconds() * 1000)
             time.sleep(.01)